@@ -1,11 +1,17 @@
-import cv2 as cv
 import numpy as np
-from onnx_model import YOLOv8_ONNX  # <--- NEW IMPORT
-import json
+from onnx_model import YOLOv8_ONNX, MultiModelRunner
+from tracker import PersonTracker
+from zones import ZoneIndex, centers_inside
+from scheduler import AdaptiveScheduler
+from fire_filter import FirePrefilter, crop_around
+from annotate import Overlay, render
+import runtime_config
+import os
 import time
 import gc
+from concurrent.futures import ThreadPoolExecutor
 
-# AI Configuration
+# AI Configuration (base cadence; the scheduler adapts around it)
 AI_SKIP_FRAMES = 3       
 FIRE_CHECK_INTERVAL = 10 
 
@@ -17,35 +23,45 @@ VIOLATION_IDS = {
 }
 
 # --- LOAD MODELS WITH ONNX RUNTIME ---
-print("Loading ONNX Models...")
-try:
-    model_ppe = YOLOv8_ONNX("models/PPE_Yolov8n.onnx")
-    print("PPE Model Loaded.")
-except Exception as e:
-    print(f"Error loading PPE Model: {e}")
-    model_ppe = None
-
-try:
-    model_fire = YOLOv8_ONNX("models/Fire_Smoke.onnx")
-    print("Fire Model Loaded.")
-except Exception as e:
-    print(f"Error loading Fire Model: {e}")
-    model_fire = None
-# -------------------------------------
+PPE_MODEL_PATH = "models/PPE_Yolov8n.onnx"
+FIRE_MODEL_PATH = "models/Fire_Smoke.onnx"
+
+# Validated config; machines, relay commands and thresholds are hot-reloaded
+# (runtime_config.start_watcher), the other sections are read at start-up
+runtime_config.set_current(runtime_config.load_initial())
+ACCIDENT_CONFIG = runtime_config.current().raw
 
-try:
-    with open('config.json', 'r') as f:
-        ACCIDENT_CONFIG = json.load(f)
-except:
-    ACCIDENT_CONFIG = {"machines": []}
+def model_path(path, precision):
+    # "int8" picks the quantized twin (quantize.py output) when it exists
+    if precision == "int8":
+        quantized = path.replace(".onnx", ".int8.onnx")
+        if os.path.exists(quantized):
+            return quantized
+        print(f"⚠️ {quantized} not found, using FP32 (run quantize.py)")
+    return path
 
-prev_time = time.time()
-frame_counter = 0
+def _load_model(label, path, precision, settings):
+    try:
+        model = YOLOv8_ONNX(model_path(path, precision), session_settings=settings)
+        print(f"{label} Model Loaded ({model.model_path}).")
+        return model
+    except Exception as e:
+        print(f"Error loading {label} Model: {e}")
+        return None
 
-last_persons = []
-last_violations = []
-last_fire_coords = []
-last_fire_status = False
+def load_models():
+    # Every camera worker process calls this to get its own ONNX sessions.
+    # Both sessions are built in parallel (ONNX Runtime releases the GIL).
+    print("Loading ONNX Models...")
+    settings = dict(ACCIDENT_CONFIG.get("onnx", {}))
+    precision = settings.pop("precision", "fp32")
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-load") as pool:
+        ppe = pool.submit(_load_model, "PPE", PPE_MODEL_PATH, precision, settings)
+        fire = pool.submit(_load_model, "Fire", FIRE_MODEL_PATH, precision, settings)
+        return ppe.result(), fire.result()
+
+# Models are loaded explicitly (services/startup.py, camera workers), never at import
+# -------------------------------------
 
 def is_inside(inner_box, outer_box):
     ix1, iy1, ix2, iy2 = inner_box
@@ -54,138 +70,277 @@ def is_inside(inner_box, outer_box):
     c_y = (iy1 + iy2) / 2
     return (ox1 < c_x < ox2) and (oy1 < c_y < oy2)
 
-fall_counter = 0        
 FALL_PERSISTENCE = 25    
 
-def overlap(frame):
-    global prev_time, frame_counter, fall_counter
-    global last_persons, last_violations, last_fire_coords, last_fire_status
-    
-    machines = ACCIDENT_CONFIG.get('machines', [])
-    h_img, w_img = frame.shape[:2]
+def make_scheduler():
+    settings = {"base_interval": AI_SKIP_FRAMES, "fire_base_interval": FIRE_CHECK_INTERVAL}
+    settings.update(ACCIDENT_CONFIG.get("scheduler", {}))
+    return AdaptiveScheduler.from_config(settings)
+
+def make_fire_filter():
+    # None when disabled in config: the fire model then runs on the scheduler's cadence
+    settings = dict(ACCIDENT_CONFIG.get("fire_filter", {}))
+    if not settings.pop("enabled", True):
+        return None
+    for key in ("crop", "temp_rate_threshold"):
+        settings.pop(key, None)
+    return FirePrefilter(**settings)
+
+class ZoneDetector:
+    """Detection state for one camera feed.
+
+    Each camera gets its own detector (and, in worker processes, its own
+    models), so frame counters, cached detections and the fall counter
+    are never shared between feeds.
+    """
+
+    def __init__(self, model_ppe=None, model_fire=None, machines=None, runner=None, scheduler=None,
+                 fire_filter="config", camera_id=None):
+        self.model_ppe = model_ppe
+        self.model_fire = model_fire
+        # None -> follow the (hot-reloaded) machines in config.json for this camera
+        self.machines = machines
+        self.camera_id = camera_id
+        # Shares one preprocessed tensor between both models and runs them concurrently
+        self.runner = runner or MultiModelRunner(max_workers=2)
+
+        # Decides per frame whether the PPE / fire models run
+        self.scheduler = scheduler or make_scheduler()
+
+        self.prev_time = time.time()
+        self.frame_counter = 0
+
+        # Persons are tracked across frames: boxes are predicted on skipped
+        # frames and fall / PPE / zone-dwell state is kept per track ID
+        self.tracker = PersonTracker()
+        self.last_persons = []
+
+        # Zone geometry for an explicit machine list (config zones come precompiled)
+        self.zone_index = None
+        self._zone_source = None
+        self.last_violations = []
+        self.last_fire_coords = []
+        self.last_fire_status = False
+        self.timings = {}
+        # What the last frame found, for annotate.render (display / incident snapshots)
+        self.overlay = None
+
+        # Two-stage fire detection: colour/flicker prefilter -> Fire_Smoke model
+        self.fire_filter = make_fire_filter() if fire_filter == "config" else fire_filter
+        fire_settings = ACCIDENT_CONFIG.get("fire_filter", {})
+        self.fire_crop = fire_settings.get("crop", True)
+        self.temp_rate_threshold = fire_settings.get("temp_rate_threshold", 0.5)
+        self.temperature_rate = 0.0
+
+    def set_temperature_trend(self, rate):
+        # °C/s from the Modulino; a fast rise forces the fire model on
+        self.temperature_rate = rate
+
+    def overlap(self, frame, annotate=True):
+        # annotate=False leaves the frame untouched; draw self.overlay later, only where it is shown or saved.
+        # One config snapshot per frame; a reload swaps in a new one between frames
+        config = runtime_config.current()
+        h_img, w_img = frame.shape[:2]
     
-    zone_breached = False
-    breached_machine_name = None
-    fire_involved = False
-    faint_detected = False
-    active_warnings = set() 
+        zone_breached = False
+        breached_machine_name = None
+        fire_involved = False
+        faint_detected = False
+        active_warnings = set() 
     
-    frame_counter += 1
-    if frame_counter % 60 == 0: gc.collect() 
+        self.frame_counter += 1
+        if self.frame_counter % 60 == 0: gc.collect() 
+
+        # --- ZONES: precompiled per config version and resolution ---
+        if self.machines is None:
+            zones = config.zones_for(self.camera_id, w_img, h_img)
+        else:
+            zones = self.zone_index
+            if zones is None or self._zone_source is not self.machines or (zones.width, zones.height) != (w_img, h_img):
+                zones = self.zone_index = ZoneIndex(self.machines, w_img, h_img)
+                self._zone_source = self.machines
+        ppe_conf, ppe_iou = config.thresholds_for("ppe")
+        fire_conf, fire_iou = config.thresholds_for("fire")
+
+        # Seconds per stage for this frame (read by benchmark.py / metrics)
+        timings = {}
+        stage = time.perf_counter()
+
+        # --- FIRE PREFILTER: cheap colour + flicker test decides if the fire model is needed ---
+        fire_forced = self.temperature_rate >= self.temp_rate_threshold
+        fire_candidates = []
+        fire_hint = True if fire_forced else None
+        if self.fire_filter is not None and self.model_fire is not None:
+            fire_candidates = self.fire_filter.update(frame)
+            # Keep confirming a known fire so the alarm clears promptly
+            fire_hint = fire_forced or bool(fire_candidates) or self.last_fire_status
+
+        # --- SCHEDULE: motion / latency driven instead of a fixed cadence ---
+        people_in_zones = any(track.zone_since for track, _ in self.last_persons)
+        run_ai, check_fire = self.scheduler.decide(frame, zones, people_in_zones=people_in_zones,
+                                                   people_tracked=bool(self.last_persons),
+                                                   fire_hint=fire_hint)
+        run_ai = run_ai and self.model_ppe is not None
+        check_fire = check_fire and self.model_fire is not None
+
+        # Small candidate regions are checked as a crop (more pixels per flame);
+        # a temperature-forced or periodic check looks at the whole frame
+        fire_job = (self.model_fire if check_fire else None, fire_conf, fire_iou)
+        crop_x, crop_y = 0, 0
+        if check_fire and fire_candidates and self.fire_crop and not fire_forced and not self.last_fire_status:
+            x1, y1, x2, y2 = crop_around(fire_candidates, w_img, h_img)
+            if (x2 - x1) * (y2 - y1) < 0.5 * w_img * h_img:
+                fire_job = (self.model_fire, fire_conf, fire_iou, frame[y1:y2, x1:x2])
+                crop_x, crop_y = x1, y1
+
+        timings["schedule"] = time.perf_counter() - stage
+
+        # --- PPE + FIRE DETECTION (ONNX, one shared preprocess) ---
+        detections, fire_detections = [], []
+        stage = time.perf_counter()
+        if run_ai or check_fire:
+            detections, fire_detections = self.runner.predict(frame, [
+                (self.model_ppe if run_ai else None, ppe_conf, ppe_iou),
+                fire_job,
+            ])
+            self.scheduler.record_inference(time.perf_counter() - stage)
+            timings.update(self.runner.timings)
+        timings["detect"] = time.perf_counter() - stage
+        stage = time.perf_counter()
+
+        person_boxes = None
+        if run_ai:
+            person_boxes = []
+            self.last_violations = []
 
-    run_ai = (frame_counter % AI_SKIP_FRAMES == 0)
-    
-    if run_ai:
-        last_persons = []
-        last_violations = []
-
-        # --- PPE DETECTION (ONNX) ---
-        if model_ppe:
-            # predict() now takes the frame directly
-            detections = model_ppe.predict(frame, conf=0.4) 
-            
             for d in detections:
                 cls_id = d['class_id']
                 coords = d['box'] # Format is [x1, y1, x2, y2]
-                
+            
                 if cls_id == PERSON_ID: 
-                    last_persons.append(coords)
+                    person_boxes.append(coords)
                 elif cls_id in VIOLATION_IDS: 
-                    last_violations.append((cls_id, coords))
+                    self.last_violations.append((cls_id, coords))
 
-        # --- FIRE DETECTION (ONNX) ---
-        if model_fire and (frame_counter % FIRE_CHECK_INTERVAL == 0):
-            last_fire_coords = []
-            last_fire_status = False
-            
-            fire_detections = model_fire.predict(frame, conf=0.5)
-            
-            for d in fire_detections:
-                last_fire_status = True
-                last_fire_coords.append(d['box'])
-
-    curr_time = time.time()
-    prev_time = curr_time
-
-    # --- DRAW MACHINES ---
-    for machine in machines:
-        z = machine['zone']
-        z_px = [int(z[0]*w_img), int(z[1]*h_img), int(z[2]*w_img), int(z[3]*h_img)]
-        cv.rectangle(frame, (z_px[0], z_px[1]), (z_px[2], z_px[3]), (255, 0, 0), 2)
-        cv.putText(frame, machine['name'], (z_px[0], z_px[1]-10), cv.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
-
-    # --- DRAW FIRE ---
-    if last_fire_status:
-        fire_involved = True
-        zone_breached = True
-        breached_machine_name = "CRITICAL: FIRE"
-        for fc in last_fire_coords:
-            cv.rectangle(frame, (fc[0], fc[1]), (fc[2], fc[3]), (0, 0, 255), 3)
-            cv.putText(frame, "FIRE", (fc[0], fc[1]-10), cv.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-    # --- DRAW PERSONS & CHECK FALLS ---
-    is_fall_detected_this_frame = False 
-
-    for p_box in last_persons:
-        px1, py1, px2, py2 = p_box
-        status_color = (0, 255, 0)
+        if check_fire:
+            self.last_fire_coords = []
+            self.last_fire_status = False
         
+            for d in fire_detections:
+                self.last_fire_status = True
+                x1, y1, x2, y2 = d['box']
+                self.last_fire_coords.append([x1 + crop_x, y1 + crop_y, x2 + crop_x, y2 + crop_y])
+
+        curr_time = time.time()
+        self.prev_time = curr_time
+
+        # --- TRACK PERSONS (update on AI frames, predict in between) ---
+        self.last_persons = self.tracker.step(person_boxes)
+        timings["tracking"] = time.perf_counter() - stage
+
+        # --- FIRE ---
+        stage = time.perf_counter()
+        if self.last_fire_status:
+            fire_involved = True
+            zone_breached = True
+            breached_machine_name = "CRITICAL: FIRE"
+
+        # --- CHECK PERSONS (all person x zone x violation tests batched) ---
+        tracks = [track for track, _ in self.last_persons]
+        p_boxes = np.array([box for _, box in self.last_persons], dtype=np.int64).reshape(-1, 4)
+        v_ids = [v_id for v_id, _ in self.last_violations]
+        v_boxes = np.array([box for _, box in self.last_violations], dtype=np.int64).reshape(-1, 4)
+
         # Fall Logic
-        p_w = px2 - px1
-        p_h = py2 - py1
-        
+        p_w = p_boxes[:, 2] - p_boxes[:, 0]
+        p_h = p_boxes[:, 3] - p_boxes[:, 1]
         ratio_condition = p_w > (p_h * 1.3) 
         size_condition = p_w > (w_img * 0.1) 
         not_giant_condition = (p_w * p_h) < (w_img * h_img * 0.7)
-        not_bottom_edge = py2 < (h_img * 0.95)
+        not_bottom_edge = p_boxes[:, 3] < (h_img * 0.95)
+        fallen = ratio_condition & size_condition & not_giant_condition & not_bottom_edge
+
+        # Violation Checks: (violations, persons)
+        violation_in_person = centers_inside(v_boxes, p_boxes)
 
-        if ratio_condition and size_condition and not_giant_condition and not_bottom_edge:
-            is_fall_detected_this_frame = True
-            status_color = (0, 0, 255) 
+        # Zone Breach Checks: (persons, zones)
+        in_zone = zones.overlaps(p_boxes)
+
+        # --- UPDATE PER-PERSON STATE ---
+        person_overlays = []   # (box, color, label, [(violation, box)]) for the overlay
+        for i, track in enumerate(tracks):
+            status_color = (0, 255, 0)
         
-        # Violation Checks
-        current_person_violations = []
-        for v_id, v_box in last_violations:
-            if is_inside(v_box, p_box):
-                violation_name = VIOLATION_IDS[v_id]
-                current_person_violations.append(violation_name)
-                vx1, vy1, vx2, vy2 = v_box
-                cv.rectangle(frame, (vx1, vy1), (vx2, vy2), (0, 0, 255), 2)
-                cv.putText(frame, violation_name, (vx1, vy1-10), cv.FONT_HERSHEY_COMPLEX_SMALL, 0.8, (0,0,255), 1)
-
-        if current_person_violations:
-            status_color = (0, 165, 255)
-            active_warnings.update(current_person_violations)
-
-        # Zone Breach Checks
-        for machine in machines:
-            z = machine['zone']
-            mz = [int(z[0]*w_img), int(z[1]*h_img), int(z[2]*w_img), int(z[3]*h_img)]
-            inter_x1 = max(mz[0], px1); inter_y1 = max(mz[1], py1)
-            inter_x2 = min(mz[2], px2); inter_y2 = min(mz[3], py2)
-            
-            if max(0, inter_x2 - inter_x1) * max(0, inter_y2 - inter_y1) > 0:
+            # Fall persistence is counted per person
+            if fallen[i]:
+                track.fall_count += 1
+                status_color = (0, 0, 255) 
+            else:
+                track.fall_count = max(0, track.fall_count - 1)
+
+            if track.fall_count > FALL_PERSISTENCE:
+                faint_detected = True
+        
+            # Violations are refreshed on AI frames and remembered per person
+            person_violations = np.flatnonzero(violation_in_person[:, i])
+            if run_ai:
+                track.violations = [VIOLATION_IDS[v_ids[v]] for v in person_violations]
+
+            if track.violations:
+                status_color = (0, 165, 255)
+                active_warnings.update(track.violations)
+
+            in_zones = [zones.names[z] for z in np.flatnonzero(in_zone[i])]
+            if in_zones:
                 zone_breached = True
                 if not fire_involved and "MAN DOWN" not in str(breached_machine_name):
-                    breached_machine_name = machine['name']
+                    breached_machine_name = in_zones[-1]
                 status_color = (0, 0, 255)
 
-        cv.rectangle(frame, (px1, py1), (px2, py2), status_color, 2)
-        cv.putText(frame,"Person", (px1, py1-10), cv.FONT_HERSHEY_COMPLEX_SMALL, 0.8, status_color, 1)
+            # Zone dwell: when this person entered each zone they are in
+            track.zone_since = {name: track.zone_since.get(name, curr_time) for name in in_zones}
+
+            label = f"Person {track.id}"
+            if track.zone_since:
+                label += f" {curr_time - min(track.zone_since.values()):.0f}s"
+            violations = [(VIOLATION_IDS[v_ids[v]], v_boxes[v].tolist()) for v in person_violations]
+            person_overlays.append((p_boxes[i].tolist(), status_color, label, violations))
 
-    if is_fall_detected_this_frame:
-        fall_counter += 1
-    else:
-        fall_counter = max(0, fall_counter - 1)
+        if faint_detected:
+            zone_breached = True
+            breached_machine_name = "MEDICAL: MAN DOWN"
+        timings["zone_logic"] = time.perf_counter() - stage
 
-    if fall_counter > FALL_PERSISTENCE:
-        faint_detected = True
-        zone_breached = True
-        breached_machine_name = "MEDICAL: MAN DOWN"
+        self.overlay = Overlay(zones, list(self.last_fire_coords) if self.last_fire_status else [],
+                               person_overlays, zone_breached)
 
-    if zone_breached:
-        cv.putText(frame, "STOP MACHINE", (50, h_img - 50), cv.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
+        # --- DRAW (optional): cached zone layer + this frame's boxes ---
+        if annotate:
+            stage = time.perf_counter()
+            render(frame, self.overlay)
+            timings["drawing"] = time.perf_counter() - stage
 
-    warning_msg = ", ".join(active_warnings) if active_warnings else None
+        warning_msg = ", ".join(active_warnings) if active_warnings else None
+        self.timings = timings
     
-    return zone_breached, frame, breached_machine_name, warning_msg, fire_involved, faint_detected
+        return zone_breached, frame, breached_machine_name, warning_msg, fire_involved, faint_detected
+
+# Default detector for the single-camera, in-process pipeline
+default_detector = None
+
+def init_default_detector(model_ppe, model_fire):
+    global default_detector
+    default_detector = ZoneDetector(model_ppe, model_fire)
+    return default_detector
+
+def get_default_detector():
+    # Loads the models on first use if nothing initialized them (scripts, tests)
+    if default_detector is None:
+        init_default_detector(*load_models())
+    return default_detector
+
+def overlap(frame):
+    return get_default_detector().overlap(frame)
+
+def set_temperature_trend(rate):
+    get_default_detector().set_temperature_trend(rate)
@@ -0,0 +1,48 @@
+import cv2 as cv
+
+# --- COLOURS (BGR) ---
+FIRE_COLOR = (0, 0, 255)
+VIOLATION_COLOR = (0, 0, 255)
+BANNER_COLOR = (0, 0, 255)
+
+class Overlay:
+    """What ZoneDetector.overlap() found on one frame, ready to be drawn.
+
+    zones: the ZoneIndex used for the frame; fires: [x1, y1, x2, y2] boxes;
+    persons: (box, color, label, [(violation name, box), ...]) tuples;
+    banner: show "STOP MACHINE".
+    """
+
+    __slots__ = ("zones", "fires", "persons", "banner")
+
+    def __init__(self, zones, fires=(), persons=(), banner=False):
+        self.zones = zones
+        self.fires = fires
+        self.persons = persons
+        self.banner = banner
+
+
+def render(frame, overlay):
+    """Draws an Overlay onto the frame in place and returns it.
+
+    Only called for frames that are shown or saved; pass a copy to keep
+    the raw frame. Zone geometry comes precompiled from the ZoneIndex, so
+    the static part is a handful of polylines / labels.
+    """
+    if overlay.zones is not None:
+        overlay.zones.draw(frame)
+
+    for fc in overlay.fires:
+        cv.rectangle(frame, (fc[0], fc[1]), (fc[2], fc[3]), FIRE_COLOR, 3)
+        cv.putText(frame, "FIRE", (fc[0], fc[1]-10), cv.FONT_HERSHEY_SIMPLEX, 0.8, FIRE_COLOR, 2)
+
+    for (px1, py1, px2, py2), status_color, label, violations in overlay.persons:
+        for name, (vx1, vy1, vx2, vy2) in violations:
+            cv.rectangle(frame, (vx1, vy1), (vx2, vy2), VIOLATION_COLOR, 2)
+            cv.putText(frame, name, (vx1, vy1-10), cv.FONT_HERSHEY_COMPLEX_SMALL, 0.8, VIOLATION_COLOR, 1)
+        cv.rectangle(frame, (px1, py1), (px2, py2), status_color, 2)
+        cv.putText(frame, label, (px1, py1-10), cv.FONT_HERSHEY_COMPLEX_SMALL, 0.8, status_color, 1)
+
+    if overlay.banner:
+        cv.putText(frame, "STOP MACHINE", (50, frame.shape[0] - 50), cv.FONT_HERSHEY_SIMPLEX, 1, BANNER_COLOR, 3)
+    return frame
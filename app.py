@@ -1,15 +1,137 @@
 import streamlit as st
-import cv2 as cv
-import numpy as np
-import time
 import threading
-import json
 import psutil
 from streamlit.runtime.scriptrunner import add_script_run_ctx
 from services.get_dates import get_dates
 from services.render_page import render_date_page
 from services.threading_file import video_live 
-import base64
+from services.metrics import registry as metrics
+from services.detector_link import ServiceClient, RingFeed, RING_NAME, SOCKET_PATH
+from services.mjpeg_server import broadcaster, start_server
+from accident_logic import ACCIDENT_CONFIG
+
+STATUS_REFRESH = 1.0  # seconds between status/metric refreshes
+
+# "service": {"attach": true} -> read from a running detector_service.py
+# instead of running the detector inside this Streamlit process
+SERVICE_CONFIG = ACCIDENT_CONFIG.get("service", {})
+ATTACHED = SERVICE_CONFIG.get("attach", False)
+
+@st.cache_resource
+def service_client():
+    # One read-only client per dashboard process, shared by every browser session
+    return ServiceClient(SERVICE_CONFIG.get("socket", SOCKET_PATH), SERVICE_CONFIG.get("ring", RING_NAME))
+
+@st.cache_resource
+def service_feed():
+    # Attached: this process serves the live feed from the service's frame ring
+    # (read + JPEG encode here), so viewers add no work to the detector process
+    stream = ACCIDENT_CONFIG.get("stream", {})
+    start_server(host=stream.get("host", "0.0.0.0"), port=SERVICE_CONFIG.get("stream_port", 8503),
+                 max_fps=stream.get("max_fps", 15), quality=stream.get("quality", 70),
+                 size=(stream.get("width", 640), stream.get("height", 480)))
+    feed = RingFeed(service_client(), broadcaster)
+    feed.start()
+    return feed
+
+LIVE_FIELDS = ("machine_overlap", "missing_ppe", "fire_involved", "faint", "current_temp")
+
+def live_state():
+    # Alert / sensor state from the attached service or this session's detector thread
+    if ATTACHED:
+        status = service_client().status
+        return {key: status.get(key) for key in LIVE_FIELDS}
+    return {key: getattr(st.session_state, key, None) for key in LIVE_FIELDS}
+
+def stream_url():
+    # The MJPEG server runs next to Streamlit; reuse the host the browser used.
+    # Attached, it is this process's ring-fed server, not the service's.
+    stream = ACCIDENT_CONFIG.get("stream", {})
+    host = st.context.headers.get("Host", "localhost").split(":")[0]
+    fps = stream.get("max_fps", 15)
+    port = SERVICE_CONFIG.get("stream_port", 8503) if ATTACHED else stream.get("port", 8502)
+    return f"http://{host}:{port}/stream.mjpg?fps={fps}"
+
+@st.fragment(run_every=STATUS_REFRESH)
+def system_status():
+    # Refresh metrics
+    cpu_usage = psutil.cpu_percent(interval=None)
+    ram = psutil.virtual_memory().percent
+    
+    # Create 3 columns now
+    c1, c2, c3 = st.columns(3)
+    c1.metric("CPU", f"{cpu_usage}%")
+    c2.metric("RAM", f"{ram}%")
+    
+    current_temp = live_state()["current_temp"] or 0.0
+    c3.metric("Temp", f"{current_temp}°C")
+
+STARTUP_ICONS = {"loading": "⏳", "ready": "✅", "unavailable": "⚠️", "failed": "❌"}
+
+@st.fragment(run_every=STATUS_REFRESH)
+def startup_status():
+    # Readiness of the start-up tasks (models, camera, serial) while they come up
+    if ATTACHED:
+        client = service_client()
+        if not client.connected:
+            st.caption("⏳ Waiting for the detector service...")
+            return
+        tasks = client.status.get("startup", {})
+    else:
+        startup = getattr(st.session_state, "startup", None)
+        if startup is None:
+            st.caption("⏳ Starting...")
+            return
+        tasks = startup.snapshot()
+    if tasks and all(t["state"] == "ready" for t in tasks.values()):
+        st.caption(f"✅ All systems ready ({max(t['seconds'] for t in tasks.values()):.1f}s)")
+        return
+    for name, task in tasks.items():
+        detail = f" ({task['seconds']}s)" if task["seconds"] is not None else ""
+        if task["state"] == "unavailable" and name == "serial":
+            detail += " - Simulation Mode"
+        elif task["error"]:
+            detail += f" - {task['error']}"
+        st.caption(f"{STARTUP_ICONS[task['state']]} {name.capitalize()}: {task['state']}{detail}")
+
+@st.fragment(run_every=STATUS_REFRESH * 2)
+def pipeline_metrics():
+    # Per-stage latency (rolling window) and counters; also served as Prometheus text on /metrics
+    if ATTACHED:
+        # The registry lives in the service process (its /metrics endpoint has the full set)
+        stage_stats = service_client().status.get("stage_stats")
+        if stage_stats:
+            st.json(stage_stats)
+        else:
+            st.caption("Waiting for the pipeline...")
+        return
+    with metrics.timer("dashboard"):
+        snapshot = metrics.snapshot()
+        if not snapshot["stages"]:
+            st.caption("Waiting for the pipeline...")
+            return
+        st.dataframe(
+            [{"stage": name, **values} for name, values in snapshot["stages"].items()],
+            hide_index=True, use_container_width=True,
+        )
+        counts = {**snapshot["counters"], **snapshot["gauges"]}
+        st.dataframe([{"metric": name, "value": value} for name, value in counts.items()],
+                     hide_index=True, use_container_width=True)
+
+@st.fragment(run_every=STATUS_REFRESH)
+def live_alerts():
+    state = live_state()
+    if state["fire_involved"]:
+        st.error(f"CRITICAL ALERT: FIRE DETECTED! EVACUATE!")
+    elif state["machine_overlap"]:
+        st.error(f"DANGER: ZONE BREACH ({state['machine_overlap']})")
+    elif state["missing_ppe"]:
+        st.warning(f"PPE VIOLATION: {state['missing_ppe']}")
+    else:
+        st.success("System Status: Secure")
+    
+    if state["faint"]:
+        st.error(f"PERSON FAINTED: {state['faint']}")
 
 def main():
 
@@ -33,7 +155,9 @@ def main():
     if "faint" not in st.session_state:
         st.session_state.faint = False
 
-    if not st.session_state.video_thread_started:
+    if ATTACHED:
+        service_feed()
+    elif not st.session_state.video_thread_started:
         t = threading.Thread(target=video_live, args=(st.session_state,), daemon=True)
         add_script_run_ctx(t)
         t.start()
@@ -41,18 +165,9 @@ def main():
 
 
     st.sidebar.title("System Status")
-    
-    # Refresh metrics
-    cpu_usage = psutil.cpu_percent(interval=None)
-    ram = psutil.virtual_memory().percent
-    
-    # Create 3 columns now
-    c1, c2, c3 = st.sidebar.columns(3)
-    c1.metric("CPU", f"{cpu_usage}%")
-    c2.metric("RAM", f"{ram}%")
-    
-    current_temp = getattr(st.session_state, 'current_temp', 0.0)
-    c3.metric("Temp", f"{current_temp}°C")
+    with st.sidebar:
+        startup_status()
+        system_status()
     
     st.sidebar.divider()
     
@@ -68,34 +183,18 @@ def main():
 
     with tab1:
         st.header("Live Monitoring")
-        
-        if st.session_state.fire_involved:
-            st.error(f"CRITICAL ALERT: FIRE DETECTED! EVACUATE!")
-        elif st.session_state.machine_overlap:
-            st.error(f"DANGER: ZONE BREACH ({st.session_state.machine_overlap})")
-        elif st.session_state.missing_ppe:
-            st.warning(f"PPE VIOLATION: {st.session_state.missing_ppe}")
-        else:
-            st.success("System Status: Secure")
-        
-        if st.session_state.faint:
-            st.error(f"PERSON FAINTED: {st.session_state.faint}")
-
-        # VIDEO FEED
-        frame_slot = st.empty()
-        if st.session_state.latest_frame is not None:
-                display_frame = cv.resize(st.session_state.latest_frame, (640, 480))
-                
-                _, buffer = cv.imencode('.jpg', display_frame, [cv.IMWRITE_JPEG_QUALITY, 70])
-                
-                img_str = base64.b64encode(buffer).decode()
-                
-                frame_slot.markdown(
-                    f'<img src="data:image/jpeg;base64,{img_str}" style="width:100%; border-radius:10px;">', 
-                    unsafe_allow_html=True
-                )
-        else:
-            frame_slot.warning("Initializing Camera Feed...")
+        live_alerts()
+
+        # VIDEO FEED: the browser pulls the MJPEG stream directly, so frames
+        # are encoded once for all viewers and never go through a rerun
+        st.markdown(
+            f'<img src="{stream_url()}" style="width:100%; border-radius:10px;" '
+            f'alt="Initializing Camera Feed...">',
+            unsafe_allow_html=True
+        )
+
+        with st.expander("Pipeline Metrics"):
+            pipeline_metrics()
 
     with tab2:
         if selected_date:
@@ -103,8 +202,5 @@ def main():
         else:
             st.info("No logs available for selected date.")
 
-    #time.sleep(0.01)
-    st.rerun()
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,271 @@
+"""Headless throughput benchmark (no camera, no Modulino needed).
+
+Replays a video file, the stored accidents/ images or synthetic frames
+through YOLOv8_ONNX + ZoneDetector.overlap and writes per-stage latency
+percentiles, FPS and peak RSS to a JSON file.
+
+    python benchmark.py --source accidents --models random --frames 300 -o bench.json
+    python benchmark.py --source plant.mp4 --compare bench.json
+
+--models real    the ONNX files in models/
+--models random  same graphs, weights re-initialized (needs the `onnx` package)
+--models stub    tiny graph with the YOLOv8 input/output shapes (no model files, still needs `onnx`)
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import cv2 as cv
+import numpy as np
+import onnxruntime as ort
+
+from onnx_model import YOLOv8_ONNX
+
+STAGES = ("preprocess", "session_run", "postprocess", "prefilter_schedule", "tracking",
+          "zone_logic", "drawing", "encode", "overlap", "frame")
+ANCHORS = 8400
+
+# --- MODELS ---
+def stub_model(num_classes, size=640, seed=0):
+    # (1, 3, size, size) -> (1, 4 + num_classes, 8400) with fixed random boxes/scores.
+    # The input is reduced into the output so ORT cannot fold the graph away.
+    from onnx import helper, numpy_helper, TensorProto
+
+    rng = np.random.default_rng(seed)
+    out = np.empty((1, 4 + num_classes, ANCHORS), dtype=np.float32)
+    out[0, 0:2] = rng.uniform(0, size, (2, ANCHORS))
+    out[0, 2:4] = rng.uniform(10, size / 3, (2, ANCHORS))
+    out[0, 4:] = rng.uniform(0, 0.6, (num_classes, ANCHORS)) ** 3
+    zero = np.zeros((1,), dtype=np.float32)
+
+    graph = helper.make_graph(
+        [helper.make_node("ReduceMean", ["images"], ["mean"], keepdims=0),
+         helper.make_node("Mul", ["mean", "zero"], ["tiny"]),
+         helper.make_node("Add", ["table", "tiny"], ["output0"])],
+        "stub",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [1, 3, size, size])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [1, 4 + num_classes, ANCHORS])],
+        [numpy_helper.from_array(out, "table"), numpy_helper.from_array(zero, "zero")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    return model.SerializeToString()
+
+def randomized_model(path, seed=0):
+    # Same graph as `path`, float weights redrawn with each tensor's own mean/std
+    import onnx
+    from onnx import numpy_helper
+
+    rng = np.random.default_rng(seed)
+    model = onnx.load(path)
+    for init in model.graph.initializer:
+        weights = numpy_helper.to_array(init)
+        if weights.dtype.kind != "f" or weights.size < 2:
+            continue
+        fresh = rng.normal(weights.mean(), weights.std() or 1e-3, weights.shape).astype(weights.dtype)
+        init.CopyFrom(numpy_helper.from_array(fresh, init.name))
+    return model.SerializeToString()
+
+def load_models(kind, seed=0):
+    import accident_logic
+    paths = (accident_logic.PPE_MODEL_PATH, accident_logic.FIRE_MODEL_PATH)
+    classes = (10, 2)
+    if kind == "real":
+        return tuple(YOLOv8_ONNX(p) for p in paths)
+    if kind == "random":
+        return tuple(YOLOv8_ONNX(randomized_model(p, seed)) for p in paths)
+    return tuple(YOLOv8_ONNX(stub_model(nc, seed=seed + i)) for i, nc in enumerate(classes))
+
+def instrument(model, samples):
+    # Time preprocess / session.run / postprocess on this model instance
+    for name, stage in (("preprocess", "preprocess"), ("infer", "session_run"), ("postprocess", "postprocess")):
+        method = getattr(model, name)
+
+        def timed(*args, _method=method, _stage=stage, **kwargs):
+            started = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                samples[_stage].append(time.perf_counter() - started)
+        setattr(model, name, timed)
+
+# --- SOURCES ---
+def frames_from(source, count, size, loop=True):
+    # Yields `count` BGR frames, looping over the source as needed (loop=False: at most one pass)
+    if source == "synthetic":
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+        for i in range(count):
+            yield np.roll(base, i * 4, axis=1)
+        return
+
+    if os.path.isdir(source):
+        files = sorted(f for f in glob.glob(os.path.join(source, "**", "*.jp*g"), recursive=True)
+                       if os.sep + "." not in f)
+        if not files:
+            raise SystemExit(f"No images under {source}")
+        produced = 0
+        while produced < count:
+            for f in files:
+                frame = cv.imread(f)
+                if frame is None:
+                    continue
+                yield frame
+                produced += 1
+                if produced >= count:
+                    return
+            if not loop:
+                return
+        return
+
+    cap = cv.VideoCapture(source)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {source}")
+    produced = 0
+    while produced < count:
+        ok, frame = cap.read()
+        if not ok:
+            if produced == 0:
+                raise SystemExit(f"No frames in video: {source}")
+            if not loop:
+                break
+            cap.set(cv.CAP_PROP_POS_FRAMES, 0)
+            continue
+        yield frame
+        produced += 1
+    cap.release()
+
+# --- REPORT ---
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    ms = np.asarray(values) * 1000
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {"count": len(ms), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3),
+            "p90_ms": round(float(p90), 3), "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(ms.max()), 3)}
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def compare(report, baseline_path, tolerance):
+    # Prints p50/p90 deltas; returns the stages that got slower than `tolerance` (fraction)
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\n{'stage':<20}{'p50 old':>10}{'p50 new':>10}{'p90 old':>10}{'p90 new':>10}")
+    for stage in STAGES:
+        old, new = baseline["stages"].get(stage, {}), report["stages"].get(stage, {})
+        if not old.get("count") or not new.get("count"):
+            continue
+        print(f"{stage:<20}{old['p50_ms']:>10.2f}{new['p50_ms']:>10.2f}{old['p90_ms']:>10.2f}{new['p90_ms']:>10.2f}")
+        # Sub-0.1 ms stages are noise
+        if new["p50_ms"] > old["p50_ms"] * (1 + tolerance) and new["p50_ms"] - old["p50_ms"] > 0.1:
+            regressions.append(stage)
+    print(f"{'fps':<20}{baseline['fps']:>10.1f}{report['fps']:>10.1f}")
+    if report["fps"] < baseline["fps"] * (1 - tolerance):
+        regressions.append("fps")
+    return regressions
+
+def run(args):
+    import accident_logic
+    from scheduler import AdaptiveScheduler
+
+    model_ppe, model_fire = load_models(args.models, args.seed)
+    samples = {stage: [] for stage in STAGES}
+    for model in (model_ppe, model_fire):
+        instrument(model, samples)
+
+    scheduler = AdaptiveScheduler(enabled=False, base_interval=1, fire_base_interval=1) if args.every_frame else None
+    detector = accident_logic.ZoneDetector(model_ppe, model_fire, scheduler=scheduler,
+                                           fire_filter=None if args.every_frame else "config")
+    encode_params = [int(cv.IMWRITE_JPEG_QUALITY), args.quality]
+
+    frames = frames_from(args.source, args.warmup + args.frames, (args.width, args.height))
+    for _ in range(args.warmup):
+        detector.overlap(next(frames))
+    for values in samples.values():
+        values.clear()
+
+    started = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        _, annotated, *_ = detector.overlap(frame, annotate=not args.headless)
+        t1 = time.perf_counter()
+        if not args.headless:
+            cv.imencode(".jpg", annotated, encode_params)
+        t2 = time.perf_counter()
+
+        timings = detector.timings
+        samples["prefilter_schedule"].append(timings.get("schedule", 0.0))
+        for stage in ("tracking", "zone_logic", "drawing"):
+            samples[stage].append(timings.get(stage, 0.0))
+        samples["overlap"].append(t1 - t0)
+        samples["encode"].append(t2 - t1)
+        samples["frame"].append(t2 - t0)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "meta": {
+            "source": args.source,
+            "models": args.models,
+            "frames": len(samples["frame"]),
+            "every_frame": args.every_frame,
+            "headless": args.headless,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "onnxruntime": ort.__version__,
+            "opencv": cv.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "fps": round(len(samples["frame"]) / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="accidents", help="video file, image folder or 'synthetic'")
+    parser.add_argument("--models", choices=("real", "random", "stub"), default="real")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--width", type=int, default=640, help="synthetic frame width")
+    parser.add_argument("--height", type=int, default=480, help="synthetic frame height")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality for the encode stage")
+    parser.add_argument("--every-frame", action="store_true",
+                        help="run both models on every frame (no scheduler / fire prefilter)")
+    parser.add_argument("--headless", action="store_true",
+                        help="no drawing / JPEG encode (detection only, like a metrics-only deployment)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument("--compare", help="baseline JSON; exit 1 if slower than --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{report['meta']['frames']} frames  {report['fps']} FPS  peak RSS {report['peak_rss_mb']} MB")
+    for stage, stats in report["stages"].items():
+        if stats["count"]:
+            print(f"  {stage:<20} p50 {stats['p50_ms']:8.2f} ms   p90 {stats['p90_ms']:8.2f} ms   p99 {stats['p99_ms']:8.2f} ms")
+    print(f"Saved: {args.output}")
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.tolerance)
+        if regressions:
+            print(f"⚠️ Regressions: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Headless detector service.
+
+Runs the capture -> inference -> publish pipeline in its own process (no
+Streamlit) and exposes it read-only:
+
+  - latest annotated frame: shared-memory ring "service.ring" (with a sequence counter)
+  - status + events (breach, ppe, fire, faint, temperature): JSON lines on "service.socket"
+  - /metrics (and /stream.mjpg for direct viewers): the MJPEG server, as before
+
+Dashboards started with "service": {"attach": true} only read from it: they
+serve their own live feed (port "service.stream_port") from the ring, so any
+number of them and of their viewers can run without slowing inference.
+
+    python detector_service.py            # run the service
+    python detector_service.py --watch    # attach and print events / frame rate
+"""
+import argparse
+import signal
+import sys
+import threading
+import time
+
+from accident_logic import ACCIDENT_CONFIG
+from services.detector_link import FrameRing, EventBus, DetectorPublisher, ServiceClient, RING_NAME, SOCKET_PATH
+
+SERVICE_CONFIG = ACCIDENT_CONFIG.get("service", {})
+
+class ServiceState:
+    """Stand-in for st.session_state: the pipeline only sets / reads attributes."""
+
+    def __init__(self):
+        self.machine_overlap = None
+        self.missing_ppe = None
+        self.fire_involved = False
+        self.faint = False
+        self.current_temp = 0.0
+        self.latest_frame = None
+
+
+def serve():
+    from services.threading_file import video_live, register_publisher
+
+    stream = ACCIDENT_CONFIG.get("stream", {})
+    ring = FrameRing(SERVICE_CONFIG.get("ring", RING_NAME), slots=SERVICE_CONFIG.get("slots", 4),
+                     shape=(stream.get("height", 480), stream.get("width", 640), 3), create=True)
+    bus = EventBus(SERVICE_CONFIG.get("socket", SOCKET_PATH))
+    register_publisher(DetectorPublisher(ring, bus, status_interval=SERVICE_CONFIG.get("status_interval", 1.0)))
+    print(f"📡 Detector service: frames on shm {ring.name!r}, events on {bus.path}")
+
+    # SIGTERM (systemd, docker stop) -> normal shutdown so the ring / socket are removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        # The pipeline stops when the main thread exits; keep it waiting here
+        threading.Thread(target=video_live, args=(ServiceState(),), name="detector", daemon=True).start()
+        while True:
+            time.sleep(1)
+    except (KeyboardInterrupt, SystemExit):
+        print("Stopping detector service")
+    finally:
+        bus.close()
+        ring.close()
+    return 0
+
+def watch():
+    # Read-only attach: print every event and the frame rate seen in the ring
+    client = ServiceClient(SERVICE_CONFIG.get("socket", SOCKET_PATH), SERVICE_CONFIG.get("ring", RING_NAME),
+                           on_event=lambda m: m["type"] != "status" and print(m))
+    last_seq, frames, started = 0, 0, time.time()
+    try:
+        while True:
+            seq, _, frame = client.frame(last_seq)
+            if frame is not None:
+                frames += 1
+                last_seq = seq
+            if time.time() - started >= 5:
+                status = "connected" if client.connected else "waiting for service"
+                print(f"[{status}] {frames / (time.time() - started):.1f} FPS, frame seq {last_seq}")
+                frames, started = 0, time.time()
+            time.sleep(0.02)
+    except KeyboardInterrupt:
+        return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--watch", action="store_true", help="attach to a running service and print its events")
+    args = parser.parse_args(argv)
+    return watch() if args.watch else serve()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import numpy as np
+import cv2 as cv
+
+PROBE_SIZE = (160, 120)
+
+# Flame colours in OpenCV HSV (H: 0-180): red/orange/yellow, saturated, bright
+FIRE_HSV_LOW = np.array([0, 80, 170], dtype=np.uint8)
+FIRE_HSV_HIGH = np.array([35, 255, 255], dtype=np.uint8)
+
+class FirePrefilter:
+    """Stage 1 of fire detection: colour + temporal flicker on a tiny probe.
+
+    update() flags regions that are flame-coloured AND whose brightness
+    keeps changing (flames flicker, orange lamps and vests do not). Only
+    frames with candidates need the Fire_Smoke network (stage 2).
+    """
+
+    def __init__(self, flicker_threshold=12.0, decay=0.7, min_pixels=6):
+        self.flicker_threshold = flicker_threshold
+        self.decay = decay
+        self.min_pixels = min_pixels
+
+        h, w = PROBE_SIZE[1], PROBE_SIZE[0]
+        self._probe = np.empty((h, w, 3), dtype=np.uint8)
+        self._hsv = np.empty((h, w, 3), dtype=np.uint8)
+        self._mask = np.empty((h, w), dtype=np.uint8)
+        self._prev_v = None
+        self._diff = np.empty((h, w), dtype=np.uint8)
+        self._flicker = np.zeros((h, w), dtype=np.float32)
+        self._kernel = np.ones((3, 3), np.uint8)
+        self.candidates = []
+
+    def update(self, frame):
+        """-> candidate boxes [x1, y1, x2, y2] in frame pixels (empty if none)."""
+        cv.resize(frame, PROBE_SIZE, dst=self._probe, interpolation=cv.INTER_AREA)
+        cv.cvtColor(self._probe, cv.COLOR_BGR2HSV, dst=self._hsv)
+        cv.inRange(self._hsv, FIRE_HSV_LOW, FIRE_HSV_HIGH, dst=self._mask)
+
+        # Exponentially decayed |dV| per pixel = flicker energy
+        v = self._hsv[:, :, 2]
+        if self._prev_v is None:
+            self._prev_v = v.copy()
+        cv.absdiff(v, self._prev_v, dst=self._diff)
+        np.copyto(self._prev_v, v)
+        self._flicker *= self.decay
+        self._flicker += (1 - self.decay) * self._diff
+
+        candidate = (self._mask > 0) & (self._flicker > self.flicker_threshold)
+        if np.count_nonzero(candidate) < self.min_pixels:
+            self.candidates = []
+            return self.candidates
+
+        candidate = cv.dilate(candidate.astype(np.uint8), self._kernel)
+        count, _, stats, _ = cv.connectedComponentsWithStats(candidate, connectivity=8)
+        sx = frame.shape[1] / PROBE_SIZE[0]
+        sy = frame.shape[0] / PROBE_SIZE[1]
+        boxes = []
+        for x, y, w, h, area in stats[1:count]:
+            if area >= self.min_pixels:
+                boxes.append([int(x * sx), int(y * sy), int((x + w) * sx), int((y + h) * sy)])
+        self.candidates = boxes
+        return boxes
+
+
+def crop_around(boxes, width, height, margin=1.0, min_size=160):
+    """Union of boxes, grown by `margin` x its size, at least min_size -> (x1, y1, x2, y2)."""
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    x1, y1 = boxes[:, 0].min(), boxes[:, 1].min()
+    x2, y2 = boxes[:, 2].max(), boxes[:, 3].max()
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    half_w = max((x2 - x1) * (1 + margin), min_size) / 2
+    half_h = max((y2 - y1) * (1 + margin), min_size) / 2
+    return (int(max(0, cx - half_w)), int(max(0, cy - half_h)),
+            int(min(width, cx + half_w)), int(min(height, cy + half_h)))
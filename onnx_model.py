@@ -1,80 +1,298 @@
+import hashlib
+import os
+import platform
+import time
 import cv2
 import numpy as np
 import onnxruntime as ort
+from concurrent.futures import ThreadPoolExecutor
+
+# Structured result returned by postprocess(..., as_array=True)
+DETECTION_DTYPE = np.dtype([
+    ("box", np.int32, (4,)),   # [x1, y1, x2, y2]
+    ("score", np.float32),
+    ("class_id", np.int32),
+])
+
+def to_dicts(detections):
+    # Structured array -> [{"box", "score", "class_id"}] used by accident_logic
+    return [
+        {"box": box, "score": score, "class_id": class_id}
+        for box, score, class_id in zip(detections["box"].tolist(),
+                                        detections["score"].tolist(),
+                                        detections["class_id"].tolist())
+    ]
+
+LETTERBOX_COLOR = 114  # Same grey padding Ultralytics uses during training
+
+# --- SESSION FACTORY ---
+# Settings come from the "onnx" section of config.json
+SESSION_DEFAULTS = {
+    "intra_op_threads": 0,            # 0 = ONNX Runtime default (one per physical core)
+    "inter_op_threads": 0,
+    "execution_mode": "sequential",   # or "parallel" (only helps graphs with parallel branches)
+    "graph_optimization": "all",      # disable | basic | extended | all
+    "optimized_dir": "models/.optimized",  # cache of optimized graphs, "" to disable
+    "providers": ["CPUExecutionProvider"],
+}
+
+GRAPH_OPTIMIZATION = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+def _session_options(settings):
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = settings["intra_op_threads"]
+    options.inter_op_num_threads = settings["inter_op_threads"]
+    options.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if settings["execution_mode"] == "parallel"
+                              else ort.ExecutionMode.ORT_SEQUENTIAL)
+    options.graph_optimization_level = GRAPH_OPTIMIZATION[settings["graph_optimization"]]
+    return options
+
+def optimized_path(model_path, settings):
+    # Cache file for this model + optimization level + runtime + CPU (layouts are hardware specific)
+    stat = os.stat(model_path)
+    key = f"{os.path.abspath(model_path)}|{stat.st_size}|{stat.st_mtime_ns}|{ort.__version__}|{platform.machine()}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(settings["optimized_dir"], f"{name}.{settings['graph_optimization']}.{digest}.onnx")
+
+def create_session(model_path, settings=None):
+    """InferenceSession with thread / execution / optimization settings.
+
+    With optimized_dir set, the first start saves the optimized graph and
+    later starts load it with optimization disabled, skipping that work.
+    model_path may also be serialized model bytes (never cached).
+    """
+    settings = {**SESSION_DEFAULTS, **(settings or {})}
+    if settings["graph_optimization"] not in GRAPH_OPTIMIZATION:
+        raise ValueError(f"Unknown graph_optimization: {settings['graph_optimization']}")
+    providers = settings["providers"]
+
+    if not isinstance(model_path, str) or not settings["optimized_dir"] or settings["graph_optimization"] == "disable":
+        return ort.InferenceSession(model_path, _session_options(settings), providers=providers)
+
+    cached = optimized_path(model_path, settings)
+    if os.path.exists(cached):
+        options = _session_options(settings)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(cached, options, providers=providers)
+        except Exception as e:
+            print(f"⚠️ Optimized model cache unusable ({e}), rebuilding")
+
+    # Optimize once and save; written to a temp name so a crash never leaves half a file
+    os.makedirs(settings["optimized_dir"], exist_ok=True)
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    options = _session_options(settings)
+    options.optimized_model_filepath = tmp
+    session = ort.InferenceSession(model_path, options, providers=providers)
+    try:
+        os.replace(tmp, cached)
+        # Drop caches of older model versions
+        prefix = os.path.basename(cached).rsplit(".", 2)[0]
+        for old in os.listdir(settings["optimized_dir"]):
+            if old.startswith(prefix + ".") and old != os.path.basename(cached) and not old.endswith(".tmp"):
+                os.remove(os.path.join(settings["optimized_dir"], old))
+    except OSError as e:
+        print(f"⚠️ Could not cache optimized model: {e}")
+    return session
+
 
 class YOLOv8_ONNX:
-    def __init__(self, model_path):
+    def __init__(self, model_path, resize_mode="letterbox", session_settings=None):
         # Load the model directly (No PyTorch needed!)
-        self.session = ort.InferenceSession(model_path)
+        self.model_path = model_path if isinstance(model_path, str) else "<memory>"
+        self.session = create_session(model_path, session_settings)
         
         # Get model info automatically
-        self.input_name = self.session.get_inputs()[0].name
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
         self.output_name = self.session.get_outputs()[0].name
-        self.input_shape = self.session.get_inputs()[0].shape
+        self.input_shape = model_input.shape
         self.img_height = self.input_shape[2]
         self.img_width = self.input_shape[3]
 
+        if resize_mode not in ("letterbox", "stretch"):
+            raise ValueError(f"Unknown resize_mode: {resize_mode}")
+        self.resize_mode = resize_mode
+
+        # Quantized models that take raw 0-255 pixels skip normalization
+        self.input_dtype = np.uint8 if model_input.type == "tensor(uint8)" else np.float32
+
+        # Preallocated buffers, reused on every frame
+        self._canvas = np.full((self.img_height, self.img_width, 3), LETTERBOX_COLOR, dtype=np.uint8)
+        self._input = np.empty((1, 3, self.img_height, self.img_width), dtype=self.input_dtype)
+        self._source_shape = None
+        self._resized = None
+
+        # (x_factor, y_factor, pad_x, pad_y): model pixels -> original pixels
+        self.transform = (1.0, 1.0, 0, 0)
+
+    def _plan_resize(self, height, width):
+        # Work out the resize target and padding once per source resolution
+        self._source_shape = (height, width)
+        self._canvas.fill(LETTERBOX_COLOR)
+
+        if self.resize_mode == "stretch":
+            self._resized = self._canvas
+            self.transform = (width / self.img_width, height / self.img_height, 0, 0)
+            return
+
+        scale = min(self.img_width / width, self.img_height / height)
+        new_w = int(round(width * scale))
+        new_h = int(round(height * scale))
+        pad_x = (self.img_width - new_w) // 2
+        pad_y = (self.img_height - new_h) // 2
+
+        # View into the canvas: cv2.resize writes straight into the padded area
+        self._resized = self._canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+        self.transform = (width / new_w, height / new_h, pad_x, pad_y)
+
     def preprocess(self, image):
-        # 1. Resize image to model input
+        # NOTE: returns the model's shared input buffer, it is overwritten on the next call
         self.original_height, self.original_width = image.shape[:2]
-        img = cv2.resize(image, (self.img_width, self.img_height))
-        
-        # 2. Convert Color (BGR -> RGB)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        # 3. Normalize (0-255 -> 0.0-1.0)
-        img = img / 255.0
-        
-        # 4. Transpose (H, W, C) -> (C, H, W) for ONNX
-        img = img.transpose(2, 0, 1)
-        
-        # 5. Add Batch Dimension (1, C, H, W)
-        img_input = np.expand_dims(img, axis=0).astype(np.float32)
-        return img_input
-
-    def postprocess(self, output, conf_threshold, iou_threshold):
-        outputs = np.transpose(np.squeeze(output[0]))
-        rows = outputs.shape[0]
-        boxes = []
-        scores = []
-        class_ids = []
-
-        x_factor = self.original_width / self.img_width
-        y_factor = self.original_height / self.img_height
-
-        for i in range(rows):
-            classes_scores = outputs[i][4:]
-            max_score = np.amax(classes_scores)
-            
-            if max_score >= conf_threshold:
-                class_id = np.argmax(classes_scores)
-                x, y, w, h = outputs[i][0], outputs[i][1], outputs[i][2], outputs[i][3]
-                
-                # Convert to standard (left, top, width, height)
-                left = int((x - w / 2) * x_factor)
-                top = int((y - h / 2) * y_factor)
-                width = int(w * x_factor)
-                height = int(h * y_factor)
-                
-                boxes.append([left, top, width, height])
-                scores.append(float(max_score))
-                class_ids.append(class_id)
-
-        indices = cv2.dnn.NMSBoxes(boxes, scores, conf_threshold, iou_threshold)
-
-        results = []
-        if len(indices) > 0:
-            for i in indices.flatten():
-                x, y, w, h = boxes[i]
-                results.append({
-                    "box": [x, y, x + w, y + h], 
-                    "score": scores[i],   
-                    "class_id": class_ids[i] 
-                })
-        return results
+        if image.shape[:2] != self._source_shape:
+            self._plan_resize(*image.shape[:2])
+
+        # 1. Resize (letterbox or stretch) into the preallocated canvas
+        target_h, target_w = self._resized.shape[:2]
+        cv2.resize(image, (target_w, target_h), dst=self._resized)
+
+        # 2. BGR -> RGB and (H, W, C) -> (C, H, W) as views, no copies
+        chw = self._canvas[..., ::-1].transpose(2, 0, 1)
+
+        # 3. Normalize (0-255 -> 0.0-1.0) directly into the input tensor
+        if self.input_dtype == np.uint8:
+            np.copyto(self._input[0], chw)
+        else:
+            np.multiply(chw, np.float32(1 / 255.0), out=self._input[0])
+        return self._input
+
+    def postprocess(self, output, conf_threshold, iou_threshold, as_array=False, transform=None):
+        # (1, 4 + classes, anchors) -> (anchors, 4 + classes)
+        outputs = np.squeeze(output[0]).T
+
+        # 1. Best class per anchor in one pass
+        class_scores = outputs[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(class_scores.shape[0]), class_ids]
+
+        # 2. Confidence mask
+        keep = scores >= conf_threshold
+        if not keep.any():
+            return np.empty(0, dtype=DETECTION_DTYPE) if as_array else []
+        boxes_xywh = outputs[keep, :4]
+        scores = scores[keep]
+        class_ids = class_ids[keep]
+
+        # 3. Convert (cx, cy, w, h) -> (left, top, width, height) in original pixels
+        #    by undoing the letterbox padding / stretch applied in preprocess
+        x_factor, y_factor, pad_x, pad_y = transform or self.transform
+
+        boxes = np.empty((boxes_xywh.shape[0], 4), dtype=np.int32)
+        boxes[:, 0] = (boxes_xywh[:, 0] - boxes_xywh[:, 2] / 2 - pad_x) * x_factor
+        boxes[:, 1] = (boxes_xywh[:, 1] - boxes_xywh[:, 3] / 2 - pad_y) * y_factor
+        boxes[:, 2] = boxes_xywh[:, 2] * x_factor
+        boxes[:, 3] = boxes_xywh[:, 3] * y_factor
+
+        # 4. Class-aware NMS (boxes of different classes never suppress each other)
+        indices = cv2.dnn.NMSBoxesBatched(boxes, scores.astype(np.float32), class_ids.astype(np.int32),
+                                          conf_threshold, iou_threshold)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+
+        results = np.empty(len(indices), dtype=DETECTION_DTYPE)
+        results["box"][:, :2] = boxes[indices, :2]
+        results["box"][:, 2:] = boxes[indices, :2] + boxes[indices, 2:]
+        results["score"] = scores[indices]
+        results["class_id"] = class_ids[indices]
+
+        if as_array:
+            return results
+        return to_dicts(results)
+
+    def preprocess_key(self):
+        # Models with the same key can share one preprocessed tensor
+        return (self.img_height, self.img_width, self.resize_mode, self.input_dtype)
 
-    def predict(self, frame, conf=0.5):
+    def infer(self, input_tensor):
+        return self.session.run([self.output_name], {self.input_name: input_tensor})
+
+    def predict(self, frame, conf=0.5, iou=0.45, as_array=False):
         input_tensor = self.preprocess(frame)
-        outputs = self.session.run([self.output_name], {self.input_name: input_tensor})
-        detections = self.postprocess(outputs, conf_threshold=conf, iou_threshold=0.45)
-        return detections
\ No newline at end of file
+        outputs = self.infer(input_tensor)
+        detections = self.postprocess(outputs, conf_threshold=conf, iou_threshold=iou, as_array=as_array)
+        return detections
+
+
+class MultiModelRunner:
+    """Runs several YOLOv8_ONNX models on the same frame.
+
+    The frame is preprocessed once per input shape and the tensor is shared
+    by every model with that shape. Sessions are submitted to a small thread
+    pool (ONNX Runtime releases the GIL during run()) so e.g. the PPE and
+    fire models execute concurrently instead of back to back.
+    """
+
+    def __init__(self, max_workers=2):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ort-runner")
+        # Seconds spent in each step by the last predict(), summed over models
+        self.timings = {}
+
+    @staticmethod
+    def _run(model, tensor, transform, conf, iou, as_array):
+        started = time.perf_counter()
+        outputs = model.infer(tensor)
+        ran = time.perf_counter()
+        detections = model.postprocess(outputs, conf_threshold=conf, iou_threshold=iou,
+                                       as_array=as_array, transform=transform)
+        return detections, ran - started, time.perf_counter() - ran
+
+    def predict(self, frame, jobs, iou=0.45, as_array=False):
+        # jobs: [(model, conf), ...] -> one detection list per job, in order.
+        # A job may set its own NMS IoU and image as (model, conf, iou, image),
+        # e.g. a crop; its boxes are then relative to that image.
+        # A job whose model is None (not loaded / not scheduled) returns [].
+        results = [[] for _ in jobs]
+        self.timings = {}
+        active = [(i, job[0], job[1], job[2] if len(job) > 2 else iou, job[3] if len(job) > 3 else frame)
+                  for i, job in enumerate(jobs) if job[0] is not None]
+        if not active:
+            return results
+
+        # 1. Preprocess once per distinct (image, input shape)
+        started = time.perf_counter()
+        shared = {}
+        keys = []
+        for _, model, _, _, image in active:
+            key = (id(image), model.preprocess_key())
+            if key not in shared:
+                tensor = model.preprocess(image)
+                shared[key] = (tensor, model.transform)
+            keys.append(key)
+        timings = {"preprocess": time.perf_counter() - started, "session_run": 0.0, "postprocess": 0.0}
+
+        # 2. Run the sessions (inline when there is only one)
+        if len(active) == 1:
+            i, model, conf, job_iou, _ = active[0]
+            tensor, transform = shared[keys[0]]
+            outcomes = [(i, self._run(model, tensor, transform, conf, job_iou, as_array))]
+        else:
+            futures = []
+            for (i, model, conf, job_iou, _), key in zip(active, keys):
+                tensor, transform = shared[key]
+                futures.append((i, self.pool.submit(self._run, model, tensor, transform, conf, job_iou, as_array)))
+            outcomes = [(i, future.result()) for i, future in futures]
+
+        for i, (detections, run_s, post_s) in outcomes:
+            results[i] = detections
+            timings["session_run"] += run_s
+            timings["postprocess"] += post_s
+        self.timings = timings
+        return results
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
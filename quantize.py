@@ -0,0 +1,167 @@
+"""Offline static INT8 quantization of the YOLOv8 ONNX models.
+
+Calibrates on frames from accidents/ (or a video), writes
+models/<name>.int8.onnx next to the FP32 model and a JSON report comparing
+the two on a disjoint set of frames from the same source: detection
+agreement (INT8 vs FP32 as reference), session.run latency and file size. Select the result with "onnx": {"precision": "int8"}.
+
+    python quantize.py                                   # both models, accidents/
+    python quantize.py --model models/PPE_Yolov8n.onnx --samples 200 --method entropy
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from onnx_model import YOLOv8_ONNX
+from tracker import iou_matrix
+from benchmark import frames_from, summarize
+from accident_logic import PPE_MODEL_PATH, FIRE_MODEL_PATH
+
+# No graph optimization or caching: compare the models as written
+RAW_SESSION = {"graph_optimization": "disable", "optimized_dir": ""}
+CALIBRATION_METHODS = ("entropy", "minmax", "percentile")
+# onnxruntime.quantization runs there: its "onnx_model" module and ours cannot share an interpreter
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quantize_worker.py")
+
+def quantize(model_path, output_path, frames, method="minmax", per_channel=True, keep_head=True):
+    # -> number of detect-head nodes kept in FP32
+    model = YOLOv8_ONNX(model_path, session_settings=RAW_SESSION)
+    with tempfile.TemporaryDirectory() as tmp:
+        job = {
+            "model": os.path.abspath(model_path), "output": os.path.abspath(output_path),
+            "input_name": model.input_name, "tensors": os.path.join(tmp, "calibration.npy"),
+            "method": method, "per_channel": per_channel, "keep_head": keep_head,
+            "result": os.path.join(tmp, "result.json"),
+        }
+        np.save(job["tensors"], np.stack([model.preprocess(frame).copy() for frame in frames]))
+        job_path = os.path.join(tmp, "job.json")
+        with open(job_path, "w") as f:
+            json.dump(job, f)
+        # -I: the repo directory stays off sys.path, so ORT finds its own onnx_model
+        subprocess.run([sys.executable, "-I", WORKER, job_path], check=True)
+        with open(job["result"]) as f:
+            return json.load(f)["excluded"]
+
+def split_frames(source, calibration, evaluation, size):
+    # Distinct frames (the source is read once, never looped), every n-th one
+    # held out for evaluation so the report is not measured on calibration data
+    frames = list(frames_from(source, calibration + evaluation, size, loop=False))
+    if len(frames) < 2:
+        raise SystemExit(f"Need at least 2 distinct frames in {source}, found {len(frames)}")
+    held_out = max(1, round(len(frames) * evaluation / (calibration + evaluation)))
+    held_out = min(held_out, len(frames) - 1)
+    eval_idx = set(np.linspace(0, len(frames) - 1, held_out).round().astype(int).tolist())
+    return ([f for i, f in enumerate(frames) if i not in eval_idx],
+            [f for i, f in enumerate(frames) if i in eval_idx])
+
+def agreement(reference, candidate, iou_threshold=0.5):
+    # Greedy same-class IoU matching of candidate detections to the reference ones
+    matched, ious = 0, []
+    used = set()
+    if len(reference) and len(candidate):
+        iou = iou_matrix(reference["box"], candidate["box"])
+        same_class = reference["class_id"][:, None] == candidate["class_id"][None, :]
+        iou = np.where(same_class, iou, 0.0)
+        for r in np.argsort(-reference["score"]):
+            c = int(np.argmax(iou[r]))
+            if iou[r, c] >= iou_threshold and c not in used:
+                used.add(c)
+                matched += 1
+                ious.append(iou[r, c])
+                iou[:, c] = 0.0
+    return matched, ious
+
+def timed_predict(model, frame, conf, iou):
+    tensor = model.preprocess(frame)
+    started = time.perf_counter()
+    outputs = model.infer(tensor)
+    elapsed = time.perf_counter() - started
+    return model.postprocess(outputs, conf, iou, as_array=True), elapsed
+
+def compare(fp32_path, int8_path, frames, conf=0.4, iou=0.45):
+    fp32 = YOLOv8_ONNX(fp32_path, session_settings=RAW_SESSION)
+    int8 = YOLOv8_ONNX(int8_path, session_settings=RAW_SESSION)
+    for model in (fp32, int8):  # warm-up
+        timed_predict(model, frames[0], conf, iou)
+
+    totals = {"reference": 0, "candidate": 0, "matched": 0}
+    ious, fp32_times, int8_times = [], [], []
+    for frame in frames:
+        ref, t_ref = timed_predict(fp32, frame, conf, iou)
+        cand, t_cand = timed_predict(int8, frame, conf, iou)
+        matched, frame_ious = agreement(ref, cand)
+        totals["reference"] += len(ref)
+        totals["candidate"] += len(cand)
+        totals["matched"] += matched
+        ious.extend(frame_ious)
+        fp32_times.append(t_ref)
+        int8_times.append(t_cand)
+
+    fp32_run, int8_run = summarize(fp32_times), summarize(int8_times)
+    return {
+        "frames": len(frames),
+        "detections_fp32": totals["reference"],
+        "detections_int8": totals["candidate"],
+        # INT8 judged against FP32: recall = FP32 detections it kept, precision = its detections FP32 agrees with
+        "recall_vs_fp32": round(totals["matched"] / totals["reference"], 4) if totals["reference"] else None,
+        "precision_vs_fp32": round(totals["matched"] / totals["candidate"], 4) if totals["candidate"] else None,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "session_run_fp32": fp32_run,
+        "session_run_int8": int8_run,
+        "speedup_p50": round(fp32_run["p50_ms"] / int8_run["p50_ms"], 2) if int8_run["p50_ms"] else None,
+        "size_mb_fp32": round(os.path.getsize(fp32_path) / 2**20, 2),
+        "size_mb_int8": round(os.path.getsize(int8_path) / 2**20, 2),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", action="append", help="FP32 model (repeatable; default: PPE and fire)")
+    parser.add_argument("--calibration", default="accidents", help="image folder or video for calibration")
+    parser.add_argument("--samples", type=int, default=100, help="calibration frames")
+    parser.add_argument("--eval-samples", type=int, default=100,
+                        help="frames for the FP32 vs INT8 report (disjoint from calibration)")
+    parser.add_argument("--method", choices=CALIBRATION_METHODS, default="minmax")
+    parser.add_argument("--per-tensor", action="store_true", help="per-tensor instead of per-channel weights")
+    parser.add_argument("--quantize-head", action="store_true", help="also quantize the detect head")
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--report", default="models/quantization_report.json")
+    args = parser.parse_args(argv)
+
+    models = args.model or [PPE_MODEL_PATH, FIRE_MODEL_PATH]
+    calibration, evaluation = split_frames(args.calibration, args.samples, args.eval_samples, (640, 480))
+
+    report = {"calibration": args.calibration, "method": args.method,
+              "calibration_frames": len(calibration), "evaluation_frames": len(evaluation),
+              "per_channel": not args.per_tensor, "models": {}}
+    for path in models:
+        if not os.path.exists(path):
+            print(f"❌ Model not found: {path}")
+            continue
+        output = path.replace(".onnx", ".int8.onnx")
+        print(f"Quantizing {path} -> {output} ({len(calibration)} calibration, "
+              f"{len(evaluation)} evaluation frames)...")
+        started = time.time()
+        excluded = quantize(path, output, calibration, args.method,
+                            per_channel=not args.per_tensor, keep_head=not args.quantize_head)
+        result = compare(path, output, evaluation, conf=args.conf)
+        result["quantize_seconds"] = round(time.time() - started, 1)
+        result["fp32_nodes_kept"] = excluded
+        report["models"][path] = result
+        print(f"  recall {result['recall_vs_fp32']}  precision {result['precision_vs_fp32']}  "
+              f"mean IoU {result['mean_iou']}  speed-up x{result['speedup_p50']}  "
+              f"{result['size_mb_fp32']} MB -> {result['size_mb_int8']} MB")
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report: {args.report}")
+    return 0 if report["models"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
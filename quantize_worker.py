@@ -0,0 +1,80 @@
+"""Static INT8 quantization step of quantize.py, in its own interpreter.
+
+onnxruntime.quantization imports ORT's top-level "onnx_model" module, which
+the repo's onnx_model.py would shadow. quantize.py runs this script with
+`python -I`, so the repo directory is not on sys.path and only ORT's module
+can be found; calibration tensors and options come in a JSON job file.
+
+    python -I quantize_worker.py job.json
+"""
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import onnx
+import onnxruntime.quantization as quantization
+
+CALIBRATION_METHODS = {
+    "minmax": quantization.CalibrationMethod.MinMax,
+    "entropy": quantization.CalibrationMethod.Entropy,
+    "percentile": quantization.CalibrationMethod.Percentile,
+}
+
+class TensorReader(quantization.CalibrationDataReader):
+    """Feeds the preprocessed frames (same letterbox as inference) to the calibrator."""
+
+    def __init__(self, input_name, tensors):
+        self.input_name = input_name
+        self._tensors = iter(tensors)
+
+    def get_next(self):
+        tensor = next(self._tensors, None)
+        return None if tensor is None else {self.input_name: tensor}
+
+
+def head_nodes(model_path):
+    # Nodes of the YOLOv8 detect head (/model.<last>/...): box decoding is
+    # precision sensitive, so it stays in FP32
+    names = [node.name for node in onnx.load(model_path).graph.node]
+    indices = [int(m.group(1)) for m in (re.match(r"/model\.(\d+)/", n) for n in names) if m]
+    if not indices:
+        return []
+    prefix = f"/model.{max(indices)}/"
+    return [n for n in names if n.startswith(prefix)]
+
+def quantize(job):
+    model_path, output_path = job["model"], job["output"]
+    prepared = output_path.replace(".onnx", ".prep.onnx")
+    try:
+        # Shape inference + graph cleanup, recommended before static quantization
+        quantization.quant_pre_process(model_path, prepared, skip_symbolic_shape=True)
+        source = prepared
+    except Exception as e:
+        print(f"⚠️ Pre-processing skipped: {e}")
+        source = model_path
+
+    reader = TensorReader(job["input_name"], np.load(job["tensors"]))
+    excluded = head_nodes(source) if job["keep_head"] else []
+    try:
+        quantization.quantize_static(
+            source, output_path, reader,
+            quant_format=quantization.QuantFormat.QDQ,
+            activation_type=quantization.QuantType.QUInt8,
+            weight_type=quantization.QuantType.QInt8,
+            per_channel=job["per_channel"],
+            calibrate_method=CALIBRATION_METHODS[job["method"]],
+            nodes_to_exclude=excluded,
+        )
+    finally:
+        if source == prepared and os.path.exists(prepared):
+            os.remove(prepared)
+    return {"excluded": len(excluded)}
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as f:
+        job = json.load(f)
+    result = quantize(job)
+    with open(job["result"], "w") as f:
+        json.dump(result, f)
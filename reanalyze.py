@@ -0,0 +1,250 @@
+"""Re-run stored incidents through (new) models and the zone rules.
+
+Streams the incident images indexed in accidents/incidents.db (folders and
+day archives) through YOLOv8_ONNX in a process pool, one ONNX Runtime
+session per model per worker, and applies the same zone / PPE rules as
+accident_logic. One JSON line per incident is appended to the output, so an
+interrupted run resumes where it stopped (incidents whose image could not be
+read are tried again). The summary compares the results
+with the stored incident labels and, with --baseline, with a previous run
+(e.g. the old model version).
+
+    python reanalyze.py                                       # current models -> reanalysis/<hash>.jsonl
+    python reanalyze.py --ppe models/PPE_v2.onnx --baseline reanalysis/3f2a9c1b7d0e.jsonl
+    python reanalyze.py --since 2026-01-01 --workers 8 --batch 8
+
+Stored images are the annotated frames, so boxes / labels drawn at the time
+are part of the input. Batches are only used when the model's batch
+dimension is dynamic (export with dynamic=True); otherwise images go one by one.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import cv2 as cv
+import numpy as np
+
+import accident_logic
+import runtime_config
+from onnx_model import DETECTION_DTYPE, YOLOv8_ONNX
+from zones import centers_inside
+from services.incident_store import get_store
+from services.incident_archive import read_incident_file
+
+# --- WORKER (one per process: its own sessions, single-threaded) ---
+_worker = {}
+
+def _init_worker(ppe_path, fire_path, settings):
+    cv.setNumThreads(1)
+    _worker["ppe"] = YOLOv8_ONNX(ppe_path, session_settings=settings) if ppe_path else None
+    _worker["fire"] = YOLOv8_ONNX(fire_path, session_settings=settings) if fire_path else None
+
+def batchable(model):
+    # Dynamic batch dimension on input and output: a symbolic name (or None) instead of 1
+    output_shape = model.session.get_outputs()[0].shape
+    return not isinstance(model.input_shape[0], int) and not isinstance(output_shape[0], int)
+
+def detect(model, frames, conf, iou):
+    # -> one structured detection array per frame
+    if model is None:
+        return [np.empty(0, dtype=DETECTION_DTYPE) for _ in frames]
+    if len(frames) > 1 and batchable(model):
+        batch = np.empty((len(frames), 3, model.img_height, model.img_width), dtype=model.input_dtype)
+        transforms = []
+        for i, frame in enumerate(frames):
+            batch[i] = model.preprocess(frame)[0]
+            transforms.append(model.transform)
+        output = model.session.run([model.output_name], {model.input_name: batch})[0]
+        return [model.postprocess([output[i:i + 1]], conf, iou, as_array=True, transform=transform)
+                for i, transform in enumerate(transforms)]
+    return [model.postprocess(model.infer(model.preprocess(frame)), conf, iou, as_array=True) for frame in frames]
+
+def evaluate(incident, frame, ppe, fire, config):
+    # Single-frame version of ZoneDetector.overlap's rules (no tracking / fall persistence)
+    h_img, w_img = frame.shape[:2]
+    zones = config.zones_for(incident["camera"], w_img, h_img)
+    persons = ppe[ppe["class_id"] == accident_logic.PERSON_ID]
+    violations = ppe[np.isin(ppe["class_id"], list(accident_logic.VIOLATION_IDS))]
+
+    in_zone = zones.overlaps(persons["box"])
+    breached = [zones.names[z] for z in np.flatnonzero(in_zone.any(axis=0))]
+    worn_by_person = centers_inside(violations["box"], persons["box"]).any(axis=1)
+    missing_ppe = sorted({accident_logic.VIOLATION_IDS[c] for c, inside
+                          in zip(violations["class_id"].tolist(), worn_by_person.tolist()) if inside})
+
+    def rows(detections):
+        return [[c, round(s, 3), *b] for c, s, b in zip(detections["class_id"].tolist(),
+                                                      detections["score"].tolist(), detections["box"].tolist())]
+
+    return {
+        "id": incident["id"], "path": incident["path"], "ts": incident["ts"], "camera": incident["camera"],
+        "stored": {"machine": incident["machine"], "fire": bool(incident["fire"])},
+        "persons": int(len(persons)),
+        "zones": breached,
+        "missing_ppe": missing_ppe,
+        "fire": bool(len(fire)),
+        "machine": "CRITICAL: FIRE" if len(fire) else (breached[-1] if breached else None),
+        "detections": {"ppe": rows(ppe), "fire": rows(fire)},
+    }
+
+def analyze_batch(incidents):
+    config = runtime_config.current()
+    results, frames, found = [], [], []
+    for incident in incidents:
+        data = read_incident_file(incident)
+        frame = cv.imdecode(np.frombuffer(data, np.uint8), cv.IMREAD_COLOR) if data else None
+        if frame is None:
+            results.append({"id": incident["id"], "path": incident["path"], "error": "image missing"})
+        else:
+            frames.append(frame)
+            found.append(incident)
+    if frames:
+        ppe = detect(_worker["ppe"], frames, *config.thresholds_for("ppe"))
+        fire = detect(_worker["fire"], frames, *config.thresholds_for("fire"))
+        results.extend(evaluate(i, f, p, x, config) for i, f, p, x in zip(found, frames, ppe, fire))
+    return results
+
+# --- RESUME / SUMMARY ---
+def read_results(path):
+    # {incident id: result}, the last line per id wins; a torn last line from an interrupted run is skipped
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[result["id"]] = result
+    return results
+
+def stored_fire(result):
+    return result["stored"]["fire"] or result["stored"]["machine"] == "CRITICAL: FIRE"
+
+def ends_with_newline(path):
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def summarize(results, baseline=None):
+    ok = [r for r in results.values() if "error" not in r]
+    stored_breach = [r for r in ok if not stored_fire(r) and r["stored"]["machine"]]
+    summary = {
+        "incidents": len(results),
+        "errors": len(results) - len(ok),
+        "persons": sum(r["persons"] for r in ok),
+        "with_fire": sum(r["fire"] for r in ok),
+        "missing_ppe": dict(Counter(v for r in ok for v in r["missing_ppe"])),
+        # Stored label still reproduced by this model version
+        "vs_stored": {
+            "breach_confirmed": sum(r["stored"]["machine"] in r["zones"] for r in stored_breach),
+            "breach_lost": sum(r["stored"]["machine"] not in r["zones"] for r in stored_breach),
+            "fire_confirmed": sum(r["fire"] for r in ok if stored_fire(r)),
+            "fire_lost": sum(not r["fire"] for r in ok if stored_fire(r)),
+            "fire_new": sum(r["fire"] for r in ok if not stored_fire(r)),
+        },
+    }
+    if baseline:
+        common = [(r, baseline[i]) for i, r in results.items() if "error" not in r and "error" not in baseline.get(i, {"error": 1})]
+        changed = {key: [r["id"] for r, b in common if r[key] != b[key]]
+                   for key in ("machine", "zones", "fire", "missing_ppe")}
+        summary["vs_baseline"] = {
+            "compared": len(common),
+            **{f"{key}_changed": len(ids) for key, ids in changed.items()},
+            "fire_gained": sum(r["fire"] and not b["fire"] for r, b in common),
+            "fire_lost": sum(b["fire"] and not r["fire"] for r, b in common),
+            "persons_delta": sum(r["persons"] - b["persons"] for r, b in common),
+            "changed_ids": {key: ids[:50] for key, ids in changed.items()},
+        }
+    return summary
+
+def model_label(*paths):
+    # Short content hash of the model files: a stable name for this model version
+    digest = hashlib.sha1()
+    for path in paths:
+        if path:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+def timestamp(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp() if value else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    onnx = accident_logic.ACCIDENT_CONFIG.get("onnx", {})
+    precision = onnx.get("precision", "fp32")
+    parser.add_argument("--ppe", default=accident_logic.model_path(accident_logic.PPE_MODEL_PATH, precision),
+                        help="PPE model ('' to skip)")
+    parser.add_argument("--fire", default=accident_logic.model_path(accident_logic.FIRE_MODEL_PATH, precision),
+                        help="fire model ('' to skip)")
+    parser.add_argument("--since", help="YYYY-MM-DD (inclusive)")
+    parser.add_argument("--until", help="YYYY-MM-DD (exclusive)")
+    parser.add_argument("--camera")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=1, help="ONNX Runtime threads per worker")
+    parser.add_argument("--batch", type=int, default=8, help="images per task (and per session.run if dynamic)")
+    parser.add_argument("-o", "--output", help="JSONL results (default: reanalysis/<model hash>.jsonl)")
+    parser.add_argument("--baseline", help="JSONL of a previous run to diff against")
+    args = parser.parse_args(argv)
+
+    label = model_label(args.ppe, args.fire)
+    output = args.output or os.path.join("reanalysis", f"{label}.jsonl")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    incidents = get_store().query(start=timestamp(args.since), end=timestamp(args.until), camera=args.camera,
+                                  newest_first=False, limit=args.limit)
+    done = read_results(output)
+    # Errors (image missing / unreadable) are retried; a later line for the same id replaces them
+    todo = [i for i in incidents if "error" in done.get(i["id"], {"error": None})]
+    print(f"{len(incidents)} incidents, {len(incidents) - len(todo)} already in {output}, {len(todo)} to analyze "
+          f"with {args.workers} workers (model version {label})")
+
+    settings = dict(onnx)
+    settings.pop("precision", None)
+    settings.update(intra_op_threads=args.threads, inter_op_threads=1)
+    batches = [todo[i:i + args.batch] for i in range(0, len(todo), args.batch)]
+
+    started = time.time()
+    processed = 0
+    if batches:
+        with mp.get_context("spawn").Pool(args.workers, initializer=_init_worker,
+                                          initargs=(args.ppe or None, args.fire or None, settings)) as pool, \
+                open(output, "a") as out:
+            if not ends_with_newline(output):
+                out.write("\n")   # end the line torn by an interruption
+            for results in pool.imap_unordered(analyze_batch, batches):
+                for result in results:
+                    out.write(json.dumps(result) + "\n")
+                    done[result["id"]] = result
+                out.flush()   # each finished batch survives an interruption
+                processed += len(results)
+                rate = processed / max(time.time() - started, 1e-6)
+                print(f"\r  {processed}/{len(todo)}  {rate:.1f} images/s", end="", flush=True)
+        print()
+
+    selected = {i["id"] for i in incidents}
+    summary = summarize({k: v for k, v in done.items() if k in selected},
+                        read_results(args.baseline) if args.baseline else None)
+    summary["meta"] = {"label": label, "ppe": args.ppe, "fire": args.fire, "output": output,
+                       "baseline": args.baseline, "seconds": round(time.time() - started, 1),
+                       "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    summary_path = output.rsplit(".", 1)[0] + ".summary.json"
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps({k: v for k, v in summary.items() if k not in ("meta",)}, indent=2))
+    print(f"Saved: {output}, {summary_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
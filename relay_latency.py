@@ -0,0 +1,207 @@
+"""Breach-to-stop latency harness (no camera, no board needed).
+
+Plays scripted scenes through the real decision path:
+
+    frame -> ZoneDetector.overlap -> send_commands -> SerialLink -> pty -> fake Modulino
+
+and records, per trial, when the scene started, when the detector reported
+it and when the (fake) board switched the relay. Relays are reset between
+trials with the board's button, as on the real panel.
+
+    python relay_latency.py --trials 30 --budget-ms 500
+    python relay_latency.py --scene fire --fps 10 -o relay_latency.json
+
+The detections are scripted (the models' session.run is replaced), so the
+numbers cover scheduling, tracking, zone logic and the serial path; run
+benchmark.py for model latency. Exit code 1 if p99 exceeds --budget-ms.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+import accident_logic
+import runtime_config
+from benchmark import stub_model, summarize
+from onnx_model import YOLOv8_ONNX
+from services import threading_file
+from services.fake_modulino import FakeModulino
+from services.serial_link import SerialLink
+
+# Scene colours (BGR); the scripted models read them back from the input tensor
+SCENES = {
+    "idle": (40, 40, 40),
+    "breach": (200, 200, 200),
+    "fire": (0, 0, 255),
+}
+
+class ScriptedModel(YOLOv8_ONNX):
+    """YOLOv8_ONNX with a fixed answer per scene instead of session.run.
+
+    Preprocess and postprocess are the real ones; infer() reads the scene
+    colour at the centre of the input tensor and returns one detection of
+    `class_id` at `box` (pixels) when the scene is `scene`.
+    """
+
+    def __init__(self, num_classes, scene, class_id, box, frame_shape):
+        super().__init__(stub_model(num_classes))
+        self.scene = scene
+        frame = np.zeros(frame_shape, dtype=np.uint8)
+        self.preprocess(frame)
+        x_factor, y_factor, pad_x, pad_y = self.transform
+
+        x1, y1, x2, y2 = box
+        self._hit = np.zeros((1, 4 + num_classes, 8400), dtype=np.float32)
+        self._hit[0, :4, 0] = ((x1 + x2) / 2 / x_factor + pad_x, (y1 + y2) / 2 / y_factor + pad_y,
+                               (x2 - x1) / x_factor, (y2 - y1) / y_factor)
+        self._hit[0, 4 + class_id, 0] = 0.95
+        self._miss = np.zeros_like(self._hit)
+
+    def infer(self, input_tensor):
+        center = input_tensor.shape[2] // 2, input_tensor.shape[3] // 2
+        r, g = (float(input_tensor[0, c, center[0], center[1]]) for c in (0, 1))
+        scene = "breach" if r > 0.5 and g > 0.5 else "fire" if r > 0.5 else "idle"
+        return [self._hit if scene == self.scene else self._miss]
+
+
+def target_machine(config, width, height):
+    # First machine with a relay command: a standing person in the middle of its zone
+    zones = config.zones_for(None, width, height)
+    for name, rect in zip(zones.names, zones.rects):
+        command = config.command_for(name)
+        if command:
+            x1, y1, x2, y2 = rect
+            cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+            return name, command, [cx - 15, cy - 30, cx + 15, cy + 30]
+    raise SystemExit("No machine with a relay \"command\" in config.json")
+
+def run(args):
+    config = runtime_config.current()
+    width, height = args.width, args.height
+    machine, command, person_box = target_machine(config, width, height)
+    expected = command if args.scene == "breach" else "fire"
+
+    board = FakeModulino(temperature=25.0, interval=0.2, melody_seconds=args.melody)
+    events = {"acted": threading.Event(), "time": None}
+
+    def on_command(arrived, acted, cmd):
+        if cmd == expected and events["time"] is None:
+            events["time"] = (arrived, acted)
+            events["acted"].set()
+    board.on_command = on_command
+
+    import serial
+    link = SerialLink(serial.Serial(board.port, 9600, timeout=1), settle_time=1.0,
+                      keepalive_interval=config.get("serial", {}).get("keepalive_interval", 5.0))
+    link.booted.wait(2.0)
+    threading_file.link = link
+
+    frame_shape = (height, width, 3)
+    fire_box = [width // 2 - 40, height // 2 - 40, width // 2 + 40, height // 2 + 40]
+    model_ppe = ScriptedModel(10, "breach", accident_logic.PERSON_ID, person_box, frame_shape)
+    model_fire = ScriptedModel(2, "fire", 0, fire_box, frame_shape)
+    detector = accident_logic.ZoneDetector(model_ppe, model_fire)
+    state = types.SimpleNamespace(current_temp=0.0, fire_involved=False)
+    frames = {name: np.full(frame_shape, color, dtype=np.uint8) for name, color in SCENES.items()}
+    period = 1.0 / args.fps
+
+    def play(scene, seconds=None, until=None):
+        # Feeds frames at the camera rate; returns when `seconds` pass or `until` is set
+        started = time.time()
+        detected = None
+        while True:
+            tick = time.time()
+            if seconds is not None and tick - started >= seconds:
+                return detected
+            if until is not None and (until.is_set() or tick - started >= args.timeout):
+                return detected
+            threading_file.read_temperature(state)
+            _, _, found, _, fire_ai, _ = detector.overlap(frames[scene].copy(), annotate=False)
+            hit = fire_ai if scene == "fire" else found == machine
+            if hit and detected is None:
+                detected = time.time()
+            threading_file.send_commands(state, found, fire_ai)
+            time.sleep(max(0.0, period - (time.time() - tick)))
+
+    trials = []
+    board.set_temperature(60.0 if args.scene == "fire" else 25.0)
+    print(f"Scene {args.scene!r}: {machine} -> {expected}, {args.trials} trials at {args.fps} FPS")
+    for i in range(args.trials):
+        play("idle", seconds=args.idle)
+        events["acted"].clear()
+        events["time"] = None
+        # The scene starts at a random point between two camera frames
+        started = time.time()
+        time.sleep(np.random.uniform(0, period))
+        detected = play(args.scene, until=events["acted"])
+        if events["time"] is None:
+            print(f"  trial {i + 1}: no {expected} within {args.timeout}s")
+            trials.append({"started": started, "detected": detected, "acted": None})
+            continue
+        arrived, acted = events["time"]
+        trials.append({"started": started, "detected": detected, "arrived": arrived, "acted": acted})
+        print(f"  trial {i + 1}: detect {1000 * (detected - started):.0f} ms, "
+              f"stop {1000 * (acted - started):.0f} ms")
+
+        # Reset: scene clears, operator presses the machine's button (fire latches all three)
+        play("idle", seconds=args.melody + 0.2)
+        for button in ([int(expected[1])] if expected != "fire" else [1, 2, 3]):
+            board.press(button)
+        play("idle", seconds=0.3)
+
+    link.close()
+    board.close()
+
+    done = [t for t in trials if t.get("acted")]
+    report = {
+        "meta": {"scene": args.scene, "machine": machine, "command": expected, "fps": args.fps,
+                 "trials": args.trials, "missed": len(trials) - len(done), "budget_ms": args.budget_ms,
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        # scene start -> overlap() reports it (scheduler cadence + tracking)
+        "detect": summarize([t["detected"] - t["started"] for t in done]),
+        # overlap() result -> command bytes at the board (link queue + UART)
+        "transport": summarize([t["arrived"] - t["detected"] for t in done]),
+        # scene start -> relay switched
+        "stop": summarize([t["acted"] - t["started"] for t in done]),
+        "trials": trials,
+    }
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scene", choices=("breach", "fire"), default="breach")
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--fps", type=float, default=15, help="camera frame rate to emulate")
+    parser.add_argument("--idle", type=float, default=1.0, help="seconds of empty scene before each trial")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for the relay")
+    parser.add_argument("--melody", type=float, default=0.5,
+                        help="seconds the board is busy after a relay change (sketch: 2.0)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--budget-ms", type=float, default=500)
+    parser.add_argument("-o", "--output", default="relay_latency.json")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for part in ("detect", "transport", "stop"):
+        stats = report[part]
+        if stats["count"]:
+            print(f"  {part:<10} p50 {stats['p50_ms']:8.1f} ms   p90 {stats['p90_ms']:8.1f} ms   "
+                  f"p99 {stats['p99_ms']:8.1f} ms   max {stats['max_ms']:8.1f} ms")
+    print(f"Saved: {args.output}")
+
+    stop = report["stop"]
+    if report["meta"]["missed"] or not stop["count"] or stop["p99_ms"] > args.budget_ms:
+        print(f"⚠️ Breach-to-stop over budget ({args.budget_ms:.0f} ms) or missed trials")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import json
+import os
+import threading
+from zones import ZoneIndex
+from services.serial_link import RELAY_COMMANDS
+
+CONFIG_PATH = "config.json"
+
+# Relay routing for configs written before machines had a "command"
+LEGACY_COMMANDS = {"Baler": "M1", "Hydraulic": "M2"}
+
+DEFAULT_THRESHOLDS = {"confidence": 0.5, "iou": 0.45}
+
+class ConfigError(ValueError):
+    """config.json is unreadable or invalid; the message lists every problem."""
+
+
+def _is_unit(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0.0 <= value <= 1.0
+
+def _check_machines(machines, where, errors):
+    if not isinstance(machines, list):
+        errors.append(f"{where}: must be a list")
+        return
+    names = set()
+    for i, machine in enumerate(machines):
+        label = f"{where}[{i}]"
+        if not isinstance(machine, dict):
+            errors.append(f"{label}: must be an object")
+            continue
+        name = machine.get("name")
+        if not isinstance(name, str) or not name:
+            errors.append(f"{label}: missing \"name\"")
+        elif name in names:
+            errors.append(f"{label}: duplicate name {name!r}")
+        names.add(name)
+        label = f"{where}[{name or i}]"
+
+        polygon, zone = machine.get("polygon"), machine.get("zone")
+        if polygon:
+            if (not isinstance(polygon, list) or len(polygon) < 3 or
+                    not all(isinstance(p, list) and len(p) == 2 and all(map(_is_unit, p)) for p in polygon)):
+                errors.append(f"{label}: \"polygon\" needs 3+ [x, y] points in 0-1")
+        elif zone is not None:
+            if not (isinstance(zone, list) and len(zone) == 4 and all(map(_is_unit, zone))):
+                errors.append(f"{label}: \"zone\" must be [x1, y1, x2, y2] in 0-1")
+            elif not (zone[0] < zone[2] and zone[1] < zone[3]):
+                errors.append(f"{label}: \"zone\" needs x1 < x2 and y1 < y2")
+        else:
+            errors.append(f"{label}: needs a \"zone\" or a \"polygon\"")
+
+        command = machine.get("command")
+        if command is not None and command not in RELAY_COMMANDS:
+            errors.append(f"{label}: \"command\" must be one of {', '.join(RELAY_COMMANDS)} or null")
+
+def validate(raw):
+    # Raises ConfigError with all problems found, so one edit can fix them all
+    errors = []
+    if not isinstance(raw, dict):
+        raise ConfigError("config.json: top level must be an object")
+
+    _check_machines(raw.get("machines", []), "machines", errors)
+
+    cameras = raw.get("cameras", [])
+    if not isinstance(cameras, list):
+        errors.append("cameras: must be a list")
+        cameras = []
+    ids = set()
+    for i, camera in enumerate(cameras):
+        if not isinstance(camera, dict):
+            errors.append(f"cameras[{i}]: must be an object")
+            continue
+        camera_id = str(camera.get("id", f"cam{i}"))
+        if camera_id in ids:
+            errors.append(f"cameras[{i}]: duplicate id {camera_id!r}")
+        ids.add(camera_id)
+        if "machines" in camera:
+            _check_machines(camera["machines"], f"cameras[{camera_id}].machines", errors)
+
+    for key in ("confidence_threshold", "iou_threshold"):
+        if key in raw and not _is_unit(raw[key]):
+            errors.append(f"{key}: must be a number in 0-1")
+    thresholds = raw.get("thresholds", {})
+    if not isinstance(thresholds, dict):
+        errors.append("thresholds: must be an object")
+    else:
+        for model, values in thresholds.items():
+            if not isinstance(values, dict):
+                errors.append(f"thresholds.{model}: must be an object")
+                continue
+            for key in ("confidence", "iou"):
+                if key in values and not (_is_unit(values[key]) and values[key] > 0):
+                    errors.append(f"thresholds.{model}.{key}: must be a number in (0, 1]")
+
+    if errors:
+        raise ConfigError("Invalid config.json:\n  " + "\n  ".join(errors))
+    return raw
+
+
+class CompiledConfig:
+    """Validated config.json plus the structures derived from it.
+
+    Built once per (re)load and never mutated afterwards, so readers take a
+    reference (current()) and use it for a whole frame while a reload swaps
+    in a new object.
+    """
+
+    def __init__(self, raw, version=0):
+        self.raw = validate(raw)
+        self.version = version
+        self.machines = raw.get("machines", [])
+        self.cameras = {str(cam.get("id", f"cam{i}")): cam for i, cam in enumerate(raw.get("cameras", []))}
+
+        # Machine name -> relay command ("M1", ...), over every camera's machines
+        self.commands = {}
+        for machines in [self.machines] + [cam.get("machines", []) for cam in self.cameras.values()]:
+            for machine in machines:
+                command = machine.get("command")
+                if command is None and "command" not in machine:
+                    command = next((cmd for key, cmd in LEGACY_COMMANDS.items() if key in machine["name"]), None)
+                    if command:
+                        print(f"⚠️ Machine {machine['name']!r} has no \"command\", using legacy {command}")
+                self.commands[machine["name"]] = command
+
+        # Model name -> (confidence, iou); top-level thresholds are the defaults
+        defaults = {"confidence": raw.get("confidence_threshold", DEFAULT_THRESHOLDS["confidence"]),
+                    "iou": raw.get("iou_threshold", DEFAULT_THRESHOLDS["iou"])}
+        self.thresholds = {model: (values.get("confidence", defaults["confidence"]), values.get("iou", defaults["iou"]))
+                           for model, values in raw.get("thresholds", {}).items()}
+        self._default_thresholds = (defaults["confidence"], defaults["iou"])
+
+        # Pixel zones per (camera, resolution), precomputed for the configured cameras
+        self._zones = {}
+        self._zones_lock = threading.Lock()
+        for camera_id, camera in self.cameras.items():
+            self.zones_for(camera_id, camera.get("width", 640), camera.get("height", 480))
+
+    def get(self, key, default=None):
+        return self.raw.get(key, default)
+
+    def machines_for(self, camera_id=None):
+        camera = self.cameras.get(camera_id, {})
+        return camera.get("machines", self.machines)
+
+    def zones_for(self, camera_id, width, height):
+        key = (camera_id if "machines" in self.cameras.get(camera_id, {}) else None, width, height)
+        zones = self._zones.get(key)
+        if zones is None:
+            with self._zones_lock:
+                zones = self._zones.get(key)
+                if zones is None:
+                    zones = self._zones[key] = ZoneIndex(self.machines_for(camera_id), width, height)
+        return zones
+
+    def command_for(self, machine_name):
+        return self.commands.get(machine_name)
+
+    def thresholds_for(self, model):
+        return self.thresholds.get(model, self._default_thresholds)
+
+
+def load(path=CONFIG_PATH, version=0):
+    try:
+        with open(path, "r") as f:
+            raw = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"{path}: {e}") from e
+    return CompiledConfig(raw, version)
+
+def load_initial(path=CONFIG_PATH):
+    # Missing file: run with no zones (loudly). Invalid file: refuse to start.
+    if not os.path.exists(path):
+        print(f"⚠️ {path} not found: no machine zones configured")
+        return CompiledConfig({"machines": []})
+    return load(path)
+
+_current = None
+
+def current():
+    return _current
+
+def set_current(config):
+    # A single reference assignment: readers see the old or the new config, never a mix
+    global _current
+    _current = config
+
+
+class ConfigWatcher(threading.Thread):
+    """Polls config.json and swaps in a new CompiledConfig when it changes.
+
+    An invalid edit is reported and ignored; the running config stays in
+    place until the file is fixed. Editors that save through a temp file
+    and rename are handled (the stat changes), as are half-written files
+    (they fail to parse and are retried on the next poll).
+    """
+
+    def __init__(self, path=CONFIG_PATH, interval=1.0, on_change=None):
+        super().__init__(name="config-watcher", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.on_change = on_change
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._stamp = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            stamp = self._stat()
+            if stamp is None or stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            self.reload()
+
+    def reload(self):
+        old = current()
+        try:
+            config = load(self.path, version=(old.version + 1) if old else 1)
+        except (ConfigError, OSError) as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"❌ Config reload rejected, keeping version {old.version if old else 0}:\n{e}")
+            return False
+        set_current(config)
+        self.reloads += 1
+        self.last_error = None
+        print(f"🔄 Config reloaded (version {config.version}, {len(config.machines)} machines)")
+        if self.on_change:
+            self.on_change(config)
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+
+_watcher = None
+
+def start_watcher(path=CONFIG_PATH, interval=1.0):
+    # Idempotent, one watcher per process (camera workers start their own)
+    global _watcher
+    if _watcher is None:
+        _watcher = ConfigWatcher(path, interval)
+        _watcher.start()
+    return _watcher
@@ -0,0 +1,165 @@
+import math
+import time
+import numpy as np
+import cv2 as cv
+
+try:
+    import psutil
+except ImportError:  # CPU headroom is optional
+    psutil = None
+
+PROBE_SIZE = (80, 60)   # motion is measured on a tiny grayscale copy
+PIXEL_DELTA = 25        # grey levels that count as "changed"
+
+class AdaptiveScheduler:
+    """Decides on which frames the PPE and fire models run.
+
+    - Motion inside (or touching) a machine zone, or a person already in a
+      zone, runs PPE at min_interval: breaches are never detected later.
+    - General motion or tracked people run PPE at base_interval.
+    - A static scene backs off one frame at a time up to max_interval.
+    - The interval is never allowed below what the measured inference time
+      and CPU headroom can sustain at target_fps (except for zone motion).
+    - The fire model runs at fire_base_interval while anything moves, and
+      backs off to fire_max_interval in a static scene. With a fire
+      prefilter (fire_hint not None) it runs at fire_min_interval while the
+      prefilter flags something and is otherwise only a fire_max_interval
+      safety sweep.
+    """
+
+    def __init__(self, enabled=True, min_interval=1, base_interval=3, max_interval=8,
+                 fire_base_interval=10, fire_max_interval=30, fire_min_interval=2, target_fps=10.0,
+                 motion_threshold=0.01, zone_motion_threshold=0.002, cpu_limit=85.0,
+                 backoff_frames=10):
+        self.enabled = enabled
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.fire_base_interval = fire_base_interval
+        self.fire_max_interval = fire_max_interval
+        self.fire_min_interval = fire_min_interval
+        self.target_fps = target_fps
+        self.motion_threshold = motion_threshold
+        self.zone_motion_threshold = zone_motion_threshold
+        self.cpu_limit = cpu_limit
+        self.backoff_frames = backoff_frames
+
+        self.interval = base_interval
+        self.motion = 0.0
+        self.zone_motion = 0.0
+        self.inference_ms = 0.0
+        self.cpu = 0.0
+
+        self._prev = None
+        self._probe = np.empty(PROBE_SIZE[::-1] + (3,), dtype=np.uint8)
+        self._gray = np.empty(PROBE_SIZE[::-1], dtype=np.uint8)
+        self._diff = np.empty(PROBE_SIZE[::-1], dtype=np.uint8)
+        self._zone_mask = None
+        self._zone_source = None
+        self._since_ppe = 0
+        self._since_fire = 0
+        self._static_frames = 0
+        self._last_cpu_check = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config)
+
+    def _zone_probe_mask(self, zones):
+        # All zones rasterized once at probe resolution
+        if self._zone_source is not zones:
+            mask = np.zeros(PROBE_SIZE[::-1], dtype=np.uint8)
+            scale = np.array([PROBE_SIZE[0] / zones.width, PROBE_SIZE[1] / zones.height])
+            for poly in zones.polygons:
+                cv.fillPoly(mask, [(poly * scale).astype(np.int32)], 1)
+            # Grow by one probe pixel so motion next to a zone counts too
+            self._zone_mask = cv.dilate(mask, np.ones((3, 3), np.uint8)).astype(bool)
+            self._zone_source = zones
+        return self._zone_mask
+
+    def observe(self, frame, zones=None):
+        # Frame-to-frame motion, overall and inside the zones (fractions of pixels)
+        cv.resize(frame, PROBE_SIZE, dst=self._probe, interpolation=cv.INTER_AREA)
+        cv.cvtColor(self._probe, cv.COLOR_BGR2GRAY, dst=self._gray)
+        if self._prev is None:
+            self._prev = self._gray.copy()
+            self.motion = self.zone_motion = 1.0
+            return
+        cv.absdiff(self._gray, self._prev, dst=self._diff)
+        np.copyto(self._prev, self._gray)
+        changed = self._diff > PIXEL_DELTA
+        self.motion = float(changed.mean())
+        if zones is not None and zones.names:
+            mask = self._zone_probe_mask(zones)
+            self.zone_motion = float(changed[mask].mean()) if mask.any() else 0.0
+        else:
+            self.zone_motion = 0.0
+
+    def record_inference(self, seconds):
+        self.inference_ms += 0.2 * (seconds * 1000 - self.inference_ms)
+
+    def _floor_interval(self):
+        # Smallest interval whose inference cost fits the frame budget (80%)
+        budget_ms = 1000.0 / self.target_fps * 0.8
+        floor = max(self.min_interval, math.ceil(self.inference_ms / budget_ms)) if self.inference_ms else self.min_interval
+        if psutil is not None:
+            now = time.time()
+            if now - self._last_cpu_check > 1.0:
+                self.cpu = psutil.cpu_percent(interval=None)
+                self._last_cpu_check = now
+            if self.cpu > self.cpu_limit:
+                floor += 1
+        return min(floor, self.max_interval)
+
+    def decide(self, frame, zones=None, people_in_zones=False, people_tracked=False, fire_hint=None):
+        """-> (run_ppe, run_fire) for this frame.
+
+        fire_hint: None without a fire prefilter, else whether it (or a
+        fast temperature rise) wants the fire model now.
+        """
+        self._since_ppe += 1
+        self._since_fire += 1
+
+        if not self.enabled:
+            run_ppe = self._since_ppe >= self.base_interval
+            run_fire = run_ppe and self._since_fire >= self.fire_base_interval
+            if fire_hint:
+                run_fire = self._since_fire >= self.fire_min_interval
+        else:
+            self.observe(frame, zones)
+            moving = self.motion > self.motion_threshold
+
+            if self.zone_motion > self.zone_motion_threshold or people_in_zones:
+                self.interval = self.min_interval
+                self._static_frames = 0
+            elif moving or people_tracked:
+                self.interval = max(self._floor_interval(), self.base_interval)
+                self._static_frames = 0
+            else:
+                self._static_frames += 1
+                if self._static_frames >= self.backoff_frames:
+                    self.interval = min(self.interval + 1, self.max_interval)
+                    self._static_frames = 0
+                self.interval = max(self.interval, self._floor_interval())
+
+            run_ppe = self._since_ppe >= self.interval
+            if fire_hint is None:
+                fire_interval = self.fire_base_interval if moving else self.fire_max_interval
+            else:
+                fire_interval = self.fire_min_interval if fire_hint else self.fire_max_interval
+            run_fire = self._since_fire >= fire_interval
+
+        if run_ppe:
+            self._since_ppe = 0
+        if run_fire:
+            self._since_fire = 0
+        return run_ppe, run_fire
+
+    def snapshot(self):
+        return {
+            "interval": self.interval,
+            "motion": round(self.motion, 4),
+            "zone_motion": round(self.zone_motion, 4),
+            "inference_ms": round(self.inference_ms, 1),
+            "cpu": self.cpu,
+        }
@@ -0,0 +1,167 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Per-camera worker processes. Each worker owns its camera, its own ONNX
+# sessions and its own ZoneDetector; the supervisor (in the main process)
+# owns the serial port and the UI state, and restarts crashed workers.
+
+INCIDENT_FRAME_INTERVAL = 1.0  # Max rate at which a worker attaches full frames for incidents
+
+def camera_worker(camera, events, stop_event, preview_fps=5, temperature_rate=None):
+    # Imported here so only the spawned process pays for importing ONNX Runtime
+    import accident_logic
+    import runtime_config
+    import annotate
+    from services.pipeline import LatestQueue, CaptureThread, open_camera
+
+    camera_id = camera["id"]
+    # Models load while the camera opens
+    loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-load")
+    models = loader.submit(accident_logic.load_models)
+    cap = open_camera(camera.get("source", "auto"), camera.get("width", 640), camera.get("height", 480))
+    if cap is None:
+        print(f"❌ [{camera_id}] Camera not found: {camera.get('source')}")
+        raise SystemExit(1)
+
+    detector = accident_logic.ZoneDetector(*models.result(), camera_id=camera_id)
+    loader.shutdown()
+    # Zones / thresholds follow config.json edits in this process too
+    runtime_config.start_watcher()
+
+    frames = LatestQueue(maxsize=1)
+    capture_stop = threading.Event()
+    capture = CaptureThread(cap, frames, capture_stop)
+    capture.start()
+    print(f"✅ [{camera_id}] Worker running")
+
+    annotate_frames = accident_logic.ACCIDENT_CONFIG.get("annotation", {}).get("enabled", True)
+    preview_interval = 1.0 / preview_fps if preview_fps else 0
+    last_preview = 0
+    last_incident_frame = 0
+
+    try:
+        while not stop_event.is_set():
+            item = frames.get(timeout=0.5)
+            if item is None:
+                continue
+            _, _, frame = item
+
+            # The supervisor owns the serial port and shares the temperature trend
+            if temperature_rate is not None:
+                detector.set_temperature_trend(temperature_rate.value)
+            is_overlap, frame, machine, ppe_warning, fire_involved_ai, fall_detected = detector.overlap(frame, annotate=False)
+
+            # Frames are only shipped across the process boundary when needed:
+            # promptly for incidents, otherwise at the preview rate.
+            now = time.time()
+            frame_out = None
+            if (is_overlap or fire_involved_ai) and now - last_incident_frame >= INCIDENT_FRAME_INTERVAL:
+                frame_out = frame
+                last_incident_frame = now
+            elif now - last_preview >= preview_interval:
+                frame_out = frame
+            if frame_out is not None:
+                last_preview = now
+                # Only the frames that leave the worker are drawn on
+                if annotate_frames:
+                    annotate.render(frame_out, detector.overlay)
+
+            result = (is_overlap, frame_out, machine, ppe_warning, fire_involved_ai, fall_detected)
+            try:
+                stats = dict(capture.meter.snapshot(), dropped_frames=frames.dropped,
+                             timings=detector.timings)
+                events.put_nowait((camera_id, result, stats))
+            except queue.Full:
+                pass  # Supervisor is behind; the next frame carries the same state
+    finally:
+        capture_stop.set()
+        capture.join(timeout=1)
+        cap.release()
+
+
+class CameraSupervisor:
+    """Starts one worker process per camera and restarts the ones that die."""
+
+    def __init__(self, cameras, on_result, restart_delay=2.0, max_restart_delay=60.0, preview_fps=5):
+        self.cameras = {cam["id"]: cam for cam in cameras}
+        self.on_result = on_result
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.preview_fps = preview_fps
+
+        # spawn: ONNX Runtime sessions must not be inherited through fork()
+        self.ctx = mp.get_context("spawn")
+        self.events = self.ctx.Queue(maxsize=8 * max(1, len(self.cameras)))
+        self.stop_event = self.ctx.Event()
+        # °C/s from the Modulino, read by every worker's fire detector
+        self.temperature_rate = self.ctx.Value("d", 0.0, lock=False)
+
+        # camera id -> {"process", "started", "restarts", "delay", "next_start"}
+        self.workers = {}
+
+    def _spawn(self, camera_id):
+        camera = self.cameras[camera_id]
+        process = self.ctx.Process(target=camera_worker,
+                                   args=(camera, self.events, self.stop_event, self.preview_fps,
+                                         self.temperature_rate),
+                                   name=f"camera-{camera_id}", daemon=True)
+        process.start()
+        worker = self.workers.setdefault(camera_id, {"restarts": 0, "delay": self.restart_delay})
+        worker.update(process=process, started=time.time(), next_start=None)
+
+    def start(self):
+        for camera_id in self.cameras:
+            self._spawn(camera_id)
+
+    def check_workers(self):
+        now = time.time()
+        for camera_id, worker in self.workers.items():
+            process = worker["process"]
+            if process.is_alive():
+                continue
+
+            if worker["next_start"] is None:
+                # A worker that ran for a while gets a fresh backoff
+                if now - worker["started"] > self.max_restart_delay:
+                    worker["delay"] = self.restart_delay
+                worker["next_start"] = now + worker["delay"]
+                print(f"⚠️ [{camera_id}] Worker exited (code {process.exitcode}), "
+                      f"restarting in {worker['delay']:.0f}s")
+                worker["delay"] = min(worker["delay"] * 2, self.max_restart_delay)
+            elif now >= worker["next_start"]:
+                worker["restarts"] += 1
+                self._spawn(camera_id)
+
+    def status(self):
+        return {
+            camera_id: {"alive": w["process"].is_alive(), "restarts": w["restarts"]}
+            for camera_id, w in self.workers.items()
+        }
+
+    def run(self, keep_running):
+        # Blocks, dispatching worker results until keep_running() returns False
+        self.start()
+        last_check = 0
+        try:
+            while keep_running():
+                try:
+                    camera_id, result, stats = self.events.get(timeout=0.5)
+                    self.on_result(camera_id, result, stats)
+                except queue.Empty:
+                    pass
+
+                if time.time() - last_check > 1.0:
+                    self.check_workers()
+                    last_check = time.time()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.stop_event.set()
+        for worker in self.workers.values():
+            worker["process"].join(timeout=2)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+import cv2 as cv
+
+class FrameRing:
+    """Fixed-size ring of recent frames in one preallocated array.
+
+    push() copies into the next slot (no per-frame allocation). Every frame
+    gets a sequence number; read() copies a frame out if it has not been
+    overwritten yet.
+    """
+
+    def __init__(self, capacity, shape):
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self.frames = np.zeros((capacity,) + self.shape, dtype=np.uint8)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.seq = 0   # sequence number of the next frame
+        self._lock = threading.Lock()
+
+    def push(self, frame, timestamp=None):
+        with self._lock:
+            slot = self.frames[self.seq % self.capacity]
+            if frame.shape == self.shape:
+                np.copyto(slot, frame)
+            else:
+                cv.resize(frame, (self.shape[1], self.shape[0]), dst=slot)
+            self.timestamps[self.seq % self.capacity] = time.time() if timestamp is None else timestamp
+            self.seq += 1
+
+    def oldest(self):
+        return max(0, self.seq - self.capacity)
+
+    def read(self, seq, out):
+        # Copy frame `seq` into `out`; False if it is not (or no longer) in the ring
+        with self._lock:
+            if seq < self.oldest() or seq >= self.seq:
+                return False
+            np.copyto(out, self.frames[seq % self.capacity])
+            return True
+
+
+class ClipRecorder:
+    """Pre/post-event clips from an in-memory ring buffer.
+
+    The capture side only calls push() (a bounded memcpy at `fps`). trigger()
+    is non-blocking: a background thread waits for the post-roll to arrive,
+    then encodes pre-roll + post-roll to `<path_base>.mp4`.
+    """
+
+    def __init__(self, pre_seconds=3.0, post_seconds=5.0, fps=5.0, max_memory_mb=64, fourcc="mp4v"):
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.max_memory_mb = max_memory_mb
+        self.fourcc = fourcc
+
+        self.ring = None
+        self.pre_frames = int(round(pre_seconds * fps))
+        self.post_frames = int(round(post_seconds * fps))
+        self.clips_written = 0
+        self._last_push = 0.0
+        self._jobs = queue.Queue(maxsize=4)
+        self._encoder = threading.Thread(target=self._encode_loop, name="clip-encoder", daemon=True)
+        self._encoder.start()
+
+    def _allocate(self, shape):
+        # Memory is bounded by max_memory_mb: the ring holds the clip plus ~2 s
+        # of slack for the encoder; if that does not fit, the pre-roll shrinks.
+        frame_bytes = int(np.prod(shape))
+        wanted = self.pre_frames + self.post_frames + int(2 * self.fps)
+        capacity = max(2, min(wanted, int(self.max_memory_mb * 1024 * 1024 // frame_bytes)))
+        if capacity < wanted:
+            self.pre_frames = max(0, min(self.pre_frames, capacity - self.post_frames - 1))
+            print(f"⚠️ Clip buffer limited to {capacity} frames ({self.pre_frames} pre-roll)")
+        self.ring = FrameRing(capacity, shape)
+
+    def due(self):
+        # True if the next push() will be kept (lets callers skip preparing the frame)
+        return time.time() - self._last_push >= 1.0 / self.fps
+
+    def push(self, frame):
+        now = time.time()
+        if now - self._last_push < 1.0 / self.fps:
+            return
+        if self.ring is None:
+            self._allocate(frame.shape)
+        self.ring.push(frame, now)
+        self._last_push = now
+
+    def mark(self):
+        # Frame range of a clip for an event now -> (start_seq, end_seq), None if no frames yet.
+        # Lets the caller decide later (e.g. after deduplication) whether to trigger it.
+        if self.ring is None:
+            return None
+        trigger_seq = self.ring.seq
+        return max(self.ring.oldest(), trigger_seq - self.pre_frames), trigger_seq + self.post_frames
+
+    def trigger(self, path_base, mark=None):
+        # Non-blocking: returns False if no frames yet or too many clips pending
+        mark = mark or self.mark()
+        if mark is None:
+            return False
+        job = (path_base, *mark)
+        try:
+            self._jobs.put_nowait(job)
+            return True
+        except queue.Full:
+            print("⚠️ Clip encoder busy, clip skipped")
+            return False
+
+    def _encode_loop(self):
+        while True:
+            path_base, start_seq, end_seq = self._jobs.get()
+
+            # Wait for the post-roll (bounded, in case the feed stops)
+            deadline = time.time() + self.post_seconds + 5
+            while self.ring.seq < end_seq and time.time() < deadline:
+                time.sleep(0.1)
+
+            try:
+                self._write_clip(path_base, start_seq, min(end_seq, self.ring.seq))
+            except Exception as e:
+                print(f"Clip Encode Error: {e}")
+
+    def _write_clip(self, path_base, start_seq, end_seq):
+        height, width = self.ring.shape[:2]
+        frame = np.empty(self.ring.shape, dtype=np.uint8)
+        final_path = f"{path_base}.mp4"
+        temp_path = f"{path_base}.tmp.mp4"
+        writer = cv.VideoWriter(temp_path, cv.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height))
+        written = 0
+        try:
+            for seq in range(start_seq, end_seq):
+                if self.ring.read(seq, frame):
+                    writer.write(frame)
+                    written += 1
+        finally:
+            writer.release()
+
+        if written:
+            os.replace(temp_path, final_path)
+            self.clips_written += 1
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,352 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+import cv2 as cv
+import numpy as np
+
+# Link between the headless detector service (detector_service.py) and any
+# number of read-only consumers (dashboards, tools):
+#   - frames: shared-memory ring of the latest annotated frames + sequence counter
+#   - status / events: newline-delimited JSON over a local Unix socket
+
+RING_NAME = "zone0_frames"
+SOCKET_PATH = "/tmp/zone0-detector.sock"
+
+MAGIC = 0x5A4F4E45300A   # "ZONE0\n"
+HEADER_FIELDS = 6         # magic, slots, height, width, channels, latest seq
+SLOT_FIELDS = 2           # seq (-1 while being written), timestamp (ns)
+
+class FrameRing:
+    """Fixed-size frame slots in multiprocessing.shared_memory.
+
+    One writer (the service) fills slot seq % slots and then publishes seq;
+    readers map the same memory and get a view or a copy of the newest
+    frame without any copy through a pipe or socket. Each slot carries its
+    own sequence number, so a reader can tell if the writer lapped it while
+    it was copying (seqlock) and simply retry.
+    """
+
+    def __init__(self, name=RING_NAME, slots=4, shape=(480, 640, 3), create=False):
+        self.name = name
+        self.owner = create
+        if create:
+            header_bytes = (HEADER_FIELDS + SLOT_FIELDS * slots) * 8
+            size = header_bytes + slots * int(np.prod(shape))
+            try:
+                # A previous service that crashed may have left the segment behind
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.header = np.ndarray((HEADER_FIELDS + SLOT_FIELDS * slots,), dtype=np.int64, buffer=self.shm.buf)
+            self.header[:] = 0
+            self.header[1:5] = (slots, *shape)
+            self.header[HEADER_FIELDS::SLOT_FIELDS] = -1
+            self.header[0] = MAGIC
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Readers must not unlink the segment when they exit (Python < 3.13 tracks every attach)
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+            probe = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            if probe[0] != MAGIC:
+                raise RuntimeError(f"Shared memory {name!r} is not a frame ring")
+            slots, height, width, channels = (int(v) for v in probe[1:5])
+            shape = (height, width, channels)
+            self.header = np.ndarray((HEADER_FIELDS + SLOT_FIELDS * slots,), dtype=np.int64, buffer=self.shm.buf)
+
+        self.slots = slots
+        self.shape = tuple(shape)
+        offset = self.header.nbytes
+        self.frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+
+    @property
+    def seq(self):
+        return int(self.header[5])
+
+    def write(self, frame):
+        # Writer side: one copy into shared memory (resized if the camera differs)
+        if frame.shape != self.shape:
+            frame = cv.resize(frame, (self.shape[1], self.shape[0]))
+        seq = self.seq + 1
+        slot = seq % self.slots
+        meta = HEADER_FIELDS + slot * SLOT_FIELDS
+        self.header[meta] = -1
+        np.copyto(self.frames[slot], frame)
+        self.header[meta + 1] = time.time_ns()
+        self.header[meta] = seq
+        self.header[5] = seq
+        return seq
+
+    def read(self, last_seq=0, copy=True):
+        # -> (seq, timestamp, frame) for the newest frame, or (last_seq, None, None) if nothing new.
+        # copy=False returns a view into shared memory: valid until the writer laps it.
+        for _ in range(3):
+            seq = self.seq
+            if seq <= last_seq or seq == 0:
+                return last_seq, None, None
+            slot = seq % self.slots
+            meta = HEADER_FIELDS + slot * SLOT_FIELDS
+            frame = self.frames[slot].copy() if copy else self.frames[slot]
+            if self.header[meta] == seq:
+                return seq, self.header[meta + 1] / 1e9, frame
+        return last_seq, None, None
+
+    def close(self):
+        self.frames = self.header = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class EventBus:
+    """Broadcasts JSON lines to every client of a local Unix socket.
+
+    publish() only appends to per-client bounded queues; each client has its
+    own sender thread, so a slow or stuck consumer loses old messages
+    instead of slowing the detector.
+    """
+
+    def __init__(self, path=SOCKET_PATH, client_queue=256):
+        self.path = path
+        self.client_queue = client_queue
+        self.greeting = None      # callable -> message sent first to each new client
+        self._clients = set()
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            os.unlink(path)   # Stale socket from a previous run
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(16)
+        threading.Thread(target=self._accept_loop, name="event-bus", daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            client = {"conn": conn, "queue": deque(maxlen=self.client_queue), "cond": threading.Condition()}
+            if self.greeting:
+                client["queue"].append(self._encode(self.greeting()))
+            with self._lock:
+                self._clients.add(ClientRef(client))
+            threading.Thread(target=self._send_loop, args=(client,), name="event-client", daemon=True).start()
+
+    @staticmethod
+    def _encode(message):
+        return (json.dumps(message, default=str) + "\n").encode()
+
+    def _send_loop(self, client):
+        conn, pending, cond = client["conn"], client["queue"], client["cond"]
+        try:
+            while True:
+                with cond:
+                    while not pending:
+                        cond.wait()
+                    data = b"".join(pending)
+                    pending.clear()
+                conn.sendall(data)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            with self._lock:
+                self._clients.discard(ClientRef(client))
+
+    def publish(self, message):
+        data = self._encode(message)
+        with self._lock:
+            clients = list(self._clients)
+        for ref in clients:
+            with ref.client["cond"]:
+                ref.client["queue"].append(data)
+                ref.client["cond"].notify()
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def close(self):
+        self._server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class ClientRef:
+    # Hashable handle for a client dict
+    __slots__ = ("client",)
+
+    def __init__(self, client):
+        self.client = client
+
+    def __hash__(self):
+        return id(self.client)
+
+    def __eq__(self, other):
+        return isinstance(other, ClientRef) and other.client is self.client
+
+
+class DetectorPublisher:
+    """Turns the pipeline state into ring frames, events and status messages.
+
+    Events: "breach", "ppe", "fire", "faint" when the value changes,
+    "temperature" when it moves by temp_step or more; a full "status"
+    message at most every status_interval seconds.
+    """
+
+    EVENT_FIELDS = {"breach": "machine_overlap", "ppe": "missing_ppe",
+                    "fire": "fire_involved", "faint": "faint"}
+
+    def __init__(self, ring, bus, status_interval=1.0, temp_step=0.5):
+        self.ring = ring
+        self.bus = bus
+        self.status_interval = status_interval
+        self.temp_step = temp_step
+        self._last = {}
+        self._last_temp = None
+        self._last_status = 0.0
+        self._state = None
+        bus.greeting = lambda: self.status(self._state)
+
+    def status(self, state):
+        if state is None:
+            return {"type": "status", "ts": time.time(), "ready": False}
+        startup = getattr(state, "startup", None)
+        return {
+            "type": "status",
+            "ts": time.time(),
+            "ready": True,
+            "frame_seq": self.ring.seq if self.ring else 0,
+            "machine_overlap": getattr(state, "machine_overlap", None),
+            "missing_ppe": getattr(state, "missing_ppe", None),
+            "fire_involved": bool(getattr(state, "fire_involved", False)),
+            "faint": bool(getattr(state, "faint", False)),
+            "current_temp": getattr(state, "current_temp", 0.0),
+            "relays_latched": getattr(state, "relays_latched", []),
+            "cameras": getattr(state, "camera_status", {}),
+            "stage_stats": getattr(state, "stage_stats", {}),
+            "startup": startup.snapshot() if startup else {},
+        }
+
+    def publish(self, state, camera_id, frame=None):
+        self._state = state
+        now = time.time()
+        if frame is not None and self.ring is not None:
+            self.ring.write(frame)
+
+        for event, field in self.EVENT_FIELDS.items():
+            value = getattr(state, field, None)
+            if self._last.get(field) != value:
+                self._last[field] = value
+                self.bus.publish({"type": event, "ts": now, "camera": camera_id, "value": value})
+
+        temp = getattr(state, "current_temp", None)
+        if temp is not None and (self._last_temp is None or abs(temp - self._last_temp) >= self.temp_step):
+            self._last_temp = temp
+            self.bus.publish({"type": "temperature", "ts": now, "value": temp})
+
+        if now - self._last_status >= self.status_interval:
+            self._last_status = now
+            self.bus.publish(self.status(state))
+
+
+class ServiceClient:
+    """Read-only view of a running detector service.
+
+    A background thread follows the event socket (reconnecting when the
+    service restarts) and keeps the latest status; frames are read straight
+    from the shared-memory ring.
+    """
+
+    def __init__(self, path=SOCKET_PATH, ring_name=RING_NAME, on_event=None):
+        self.path = path
+        self.ring_name = ring_name
+        self.on_event = on_event
+        self.status = {}
+        self.events = deque(maxlen=100)
+        self.connected = False
+        self.generation = 0   # bumped on every (re)connect: the service's ring may be a new one
+        self._ring = None
+        threading.Thread(target=self._follow, name="service-client", daemon=True).start()
+
+    def _follow(self):
+        while True:
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                    conn.connect(self.path)
+                    # A restarted service recreates the ring: map the new segment
+                    self._ring = None
+                    self.generation += 1
+                    self.connected = True
+                    for line in conn.makefile("r", encoding="utf-8"):
+                        message = json.loads(line)
+                        if message.get("type") == "status":
+                            self.status = message
+                        else:
+                            self.events.append(message)
+                        if self.on_event:
+                            self.on_event(message)
+            except (OSError, ValueError):
+                pass
+            self.connected = False
+            time.sleep(1.0)
+
+    def frame(self, last_seq=0):
+        # Newest annotated frame -> (seq, timestamp, frame) or (last_seq, None, None)
+        ring = self._ring   # _follow may drop it meanwhile
+        if ring is None:
+            try:
+                ring = self._ring = FrameRing(self.ring_name)
+            except (FileNotFoundError, RuntimeError):
+                return last_seq, None, None
+        if ring.seq < last_seq:
+            last_seq = 0   # A recreated ring restarts its sequence
+        return ring.read(last_seq)
+
+
+class RingFeed(threading.Thread):
+    """Feeds a FrameBroadcaster in an attached process from the service's ring.
+
+    Runs next to the dashboard: ring reads and the JPEG encode for its
+    viewers happen in this process, so the detector service does no work
+    per viewer. The ring is only read while a stream client is connected.
+    """
+
+    def __init__(self, client, broadcaster, poll_interval=0.01):
+        super().__init__(name="ring-feed", daemon=True)
+        self.client = client
+        self.broadcaster = broadcaster
+        self.poll_interval = poll_interval
+
+    def run(self):
+        last_seq, generation = 0, None
+        while True:
+            if not self.broadcaster.clients:
+                time.sleep(0.2)
+                continue
+            try:
+                if self.client.generation != generation:
+                    # Service (re)started, possibly while nobody was watching: new ring, new sequence
+                    last_seq, generation = 0, self.client.generation
+                seq, _, frame = self.client.frame(last_seq)
+                if frame is None:
+                    time.sleep(self.poll_interval)
+                    continue
+                last_seq = seq
+                self.broadcaster.publish(frame)
+            except Exception as e:
+                print(f"Ring Feed Error: {e}")
+                time.sleep(1.0)
@@ -0,0 +1,156 @@
+import os
+import queue
+import select
+import threading
+import time
+import tty
+
+# Pseudo-terminal stand-in for Modulino_Zone0.ino, so the serial path
+# (SerialLink -> UART -> relay latch -> button reset) runs without hardware.
+#
+#   python -m services.fake_modulino             # prints the port, then: t 62 | b 1 | q
+#   ZONE0_SERIAL_PORT=/dev/pts/N streamlit run app.py
+#
+# or "serial": {"fake": true} / ZONE0_FAKE_MODULINO=1 to start one in-process.
+
+MELODY_SECONDS = 8 * 0.25   # playMelody(): 8 notes x 250 ms, the loop is blocked meanwhile
+INVALID_REPLY = "❌ Invalid Command (Use M1, M2, M3)"
+
+class FakeModulino:
+    """Implements the sketch's serial protocol on a pty.
+
+    - Prints the temperature every `interval` seconds ("T:24.5", or the
+      sketch's "24.5°C" with temp_format="{:.1f}°C"), followed by the relay
+      state ("Relays 1 0 1", 1 = running; report_relays=False for firmware
+      without it).
+    - "M1" / "M2" / "M3" toggle the relay and answer "Motor N ON/OFF";
+      "fire" switches every relay off if the temperature is above 50°C.
+    - press(n) is button n: relay n back on, "Button n pressed".
+    - Like the sketch, one command is handled per loop and a relay change
+      blocks the loop for the melody (melody_seconds).
+    - A pty has no line rate, so each line arrives after the time it would
+      take on the UART at `baud` (10 bits per byte).
+
+    Every command the board acts on is kept in `received` as
+    (time it arrived, time it was acted on, command) for latency checks.
+    """
+
+    def __init__(self, temperature=25.0, interval=0.5, melody_seconds=MELODY_SECONDS,
+                 temp_format="T:{:.1f}", fire_threshold=50.0, baud=9600, report_relays=True):
+        self.temperature = temperature
+        self.interval = interval
+        self.melody_seconds = melody_seconds
+        self.temp_format = temp_format
+        self.fire_threshold = fire_threshold
+        self.baud = baud
+        self.report_relays = report_relays
+        self.relays = {1: True, 2: True, 3: True}   # True = machine running (pin HIGH)
+        self.received = []
+        self.on_command = None                       # callback(arrived, acted, command)
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._buttons = queue.Queue()
+        self._lines = []     # (arrival time, command) not handled yet
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="fake-modulino", daemon=True)
+        self._thread.start()
+
+    def set_temperature(self, celsius):
+        self.temperature = celsius
+
+    def press(self, button):
+        self._buttons.put(button)
+
+    def _println(self, text):
+        try:
+            os.write(self._master, text.encode() + b"\r\n")
+        except OSError:
+            pass
+
+    def _read(self, pending, timeout):
+        ready, _, _ = select.select([self._master], [], [], timeout)
+        if not ready:
+            return pending
+        try:
+            pending += os.read(self._master, 1024)
+        except OSError:
+            return pending
+        now = time.time()
+        while b"\n" in pending:
+            line, pending = pending.split(b"\n", 1)
+            now += (len(line) + 1) * 10 / self.baud
+            self._lines.append((now, line.decode("utf-8", errors="ignore").strip()))
+        return pending
+
+    def _command(self, arrived, cmd):
+        acted = time.time()
+        busy = 0.0
+        if cmd in ("M1", "M2", "M3"):
+            n = int(cmd[1])
+            self.relays[n] = not self.relays[n]
+            self._println(f"Motor {n} {'ON' if self.relays[n] else 'OFF'}")
+            busy = self.melody_seconds
+        elif cmd == "fire" and self.temperature > self.fire_threshold:
+            for n in self.relays:
+                self.relays[n] = False
+            self._println("⚠ OVER TEMPERATURE! MACHINES OFF")
+            busy = self.melody_seconds
+        # The sketch's if/else chain answers "invalid" to everything but M3
+        if cmd != "M3":
+            self._println(INVALID_REPLY)
+
+        self.received.append((arrived, acted, cmd))
+        if self.on_command:
+            self.on_command(arrived, acted, cmd)
+        return busy
+
+    def _loop(self):
+        pending = b""
+        next_temp = 0.0
+        busy_until = 0.0
+        while not self._stop.is_set():
+            now = time.time()
+            if now < busy_until:
+                # Melody playing: bytes pile up in the UART, nothing is handled
+                pending = self._read(pending, min(busy_until - now, 0.05))
+                continue
+
+            if now >= next_temp:
+                self._println(self.temp_format.format(self.temperature))
+                if self.report_relays:
+                    self._println("Relays " + " ".join("1" if self.relays[n] else "0" for n in sorted(self.relays)))
+                next_temp = now + self.interval
+
+            pending = self._read(pending, 0.001 if self._lines else 0.005)
+            if self._lines and self._lines[0][0] <= time.time():
+                arrived, cmd = self._lines.pop(0)
+                busy_until = time.time() + self._command(arrived, cmd)
+
+            while not self._buttons.empty():
+                n = self._buttons.get()
+                self._println(f"Button {n} pressed")
+                self.relays[n] = True
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+        os.close(self._master)
+        os.close(self._slave)
+
+
+if __name__ == "__main__":
+    board = FakeModulino()
+    board.on_command = lambda arrived, acted, cmd: print(f"<- {cmd} (relays {board.relays})")
+    print(f"Fake Modulino on {board.port}  (t <celsius> | b <button> | q)")
+    try:
+        for line in iter(input, "q"):
+            parts = line.split()
+            if len(parts) == 2 and parts[0] == "t":
+                board.set_temperature(float(parts[1]))
+            elif len(parts) == 2 and parts[0] == "b":
+                board.press(int(parts[1]))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    board.close()
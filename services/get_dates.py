@@ -1,23 +1,5 @@
-import os 
-from datetime import datetime
-
-accidents_dir = 'accidents'
+from services.incident_store import get_store
 
 def get_dates():
-    if not os.path.exists("accidents"):
-        return []
-    
-    dates = []
-    for name in os.listdir(accidents_dir):
-        path = os.path.join(accidents_dir, name)
-
-        if not os.path.isdir(path):
-            continue
-        try:
-            datetime.strptime(name, "%Y-%m-%d")
-            dates.append(name)
-        except ValueError:
-            continue
-
-    return sorted(dates, reverse=True)
-
+    # Days with at least one incident, newest first (indexed query, no folder scan)
+    return get_store().dates()
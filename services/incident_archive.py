@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from services.incident_store import get_store, BASE_DIR
+
+# Completed days are packed from accidents/YYYY-MM-DD/ (one JPEG + JSON per
+# incident, clips) into accidents/YYYY-MM-DD.zip. Members are stored
+# uncompressed (JPEG / MP4 are already compressed), so the zip's central
+# directory gives random access to any one file; index.json in the archive
+# carries the incident rows so the database can be rebuilt from it.
+
+INDEX_MEMBER = "index.json"
+
+def archive_path(day, base_dir=BASE_DIR):
+    return os.path.join(base_dir, f"{day}.zip")
+
+def member_name(path):
+    return os.path.basename(path)
+
+def compact_day(day, store=None, base_dir=BASE_DIR):
+    # -> number of files packed; the folder is removed once the database points at the archive
+    store = store or get_store()
+    folder = os.path.join(base_dir, day)
+    archive = archive_path(day, base_dir)
+    incidents = {member_name(i["path"]): i for i in store.query(day=day, newest_first=False)}
+    names = sorted(e.name for e in os.scandir(folder) if e.is_file() and not e.name.endswith(".tmp"))
+
+    temp_path = f"{archive}.tmp"
+    with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_STORED) as zf:
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            incident = incidents.get(f"{stem}.jpg")
+            if ext == ".json" and incident:
+                # The JSON gets the final count / time span of merged near-duplicates
+                zf.writestr(name, json.dumps({"machine": incident["machine"], "fire_involved": bool(incident["fire"]),
+                                              "camera": incident["camera"], "count": incident["count"],
+                                              "ts_end": incident["ts_end"]}))
+            else:
+                zf.write(os.path.join(folder, name), name)
+        if os.path.exists(archive):
+            # Late files for an already packed day: keep what the archive had
+            with zipfile.ZipFile(archive) as old:
+                for info in old.infolist():
+                    if info.filename not in names and info.filename != INDEX_MEMBER:
+                        zf.writestr(info, old.read(info))
+        index = [{key: i[key] for key in ("ts", "day", "machine", "fire", "camera", "path", "count", "ts_end", "dhash")}
+                 for i in incidents.values()]
+        zf.writestr(INDEX_MEMBER, json.dumps(index))
+    with open(temp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, archive)
+    readers.forget(archive)
+
+    store.set_archive(day, archive)
+    shutil.rmtree(folder, ignore_errors=True)
+    return len(names)
+
+def remove_day(day, store=None, base_dir=BASE_DIR):
+    # Retention: drop a day's folder / archive and its rows
+    store = store or get_store()
+    for path in (archive_path(day, base_dir), os.path.join(base_dir, day)):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    readers.forget(archive_path(day, base_dir))
+    return store.delete_day(day)
+
+
+class ArchiveReader:
+    """Keeps a few day archives open for the history view.
+
+    Reading one member is a seek to its offset (from the zip's central
+    directory, parsed once per archive) and one read.
+    """
+
+    def __init__(self, max_open=8):
+        self.max_open = max_open
+        self._open = OrderedDict()   # archive path -> ZipFile, least recently used first
+        self._lock = threading.Lock()
+
+    def read(self, archive, path):
+        # Bytes of the incident file `path` inside `archive`, None if it is gone
+        with self._lock:
+            try:
+                zf = self._open.get(archive)
+                if zf is None:
+                    zf = self._open[archive] = zipfile.ZipFile(archive)
+                    if len(self._open) > self.max_open:
+                        self._open.popitem(last=False)[1].close()
+                self._open.move_to_end(archive)
+                return zf.read(member_name(path))
+            except (OSError, KeyError, zipfile.BadZipFile):
+                return None
+
+    def forget(self, archive):
+        with self._lock:
+            zf = self._open.pop(archive, None)
+        if zf:
+            zf.close()
+
+readers = ArchiveReader()
+
+def read_incident_file(incident):
+    # JPEG bytes of an incident row, from its folder or its day archive
+    if incident.get("archive"):
+        return readers.read(incident["archive"], incident["path"])
+    try:
+        with open(incident["path"], "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+class IncidentCompactor(threading.Thread):
+    """Background packing of completed days, plus retention.
+
+    Every `interval` seconds: each day folder before today whose files are
+    older than `min_age` seconds (clip post-roll done) is compacted; days
+    older than `retention_days` are deleted (None keeps everything).
+    """
+
+    def __init__(self, interval=3600, retention_days=None, min_age=600, base_dir=BASE_DIR):
+        super().__init__(name="incident-compactor", daemon=True)
+        self.interval = interval
+        self.retention_days = retention_days
+        self.min_age = min_age
+        self.base_dir = base_dir
+        self._stop = threading.Event()
+
+    def completed_days(self):
+        today = date.today().isoformat()
+        days = []
+        if not os.path.isdir(self.base_dir):
+            return days
+        for entry in sorted(os.scandir(self.base_dir), key=lambda e: e.name):
+            try:
+                datetime.strptime(entry.name, "%Y-%m-%d")
+            except ValueError:
+                continue
+            if not entry.is_dir() or entry.name >= today:
+                continue
+            newest = max((e.stat().st_mtime for e in os.scandir(entry.path)), default=0)
+            if time.time() - newest >= self.min_age:
+                days.append(entry.name)
+        return days
+
+    def run_once(self):
+        store = get_store()
+        packed = removed = 0
+        if self.retention_days:
+            cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+            for day in store.dates():
+                if day < cutoff:
+                    removed += remove_day(day, store, self.base_dir)
+        for day in self.completed_days():
+            try:
+                packed += compact_day(day, store, self.base_dir)
+                print(f"🗜️ Incidents of {day} packed into {archive_path(day, self.base_dir)}")
+            except Exception as e:
+                print(f"❌ Compacting {day} failed: {e}")
+        return packed, removed
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Incident compactor: {e}")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+_compactor = None
+
+def start_compactor(settings):
+    # Idempotent; settings is config.json's "archive" section
+    global _compactor
+    if _compactor is None and settings.get("enabled", True):
+        _compactor = IncidentCompactor(interval=settings.get("interval", 3600),
+                                       retention_days=settings.get("retention_days"),
+                                       min_age=settings.get("min_age", 600))
+        _compactor.start()
+    return _compactor
+
+
+if __name__ == "__main__":
+    # python -m services.incident_archive [retention_days] -> compact / prune once
+    import sys
+    compactor = IncidentCompactor(retention_days=int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    packed, removed = compactor.run_once()
+    print(f"Packed {packed} files, removed {removed} incidents")
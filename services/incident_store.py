@@ -0,0 +1,224 @@
+import os
+import json
+import sqlite3
+import zipfile
+import threading
+import time
+from datetime import datetime
+
+BASE_DIR = "accidents"
+DB_PATH = os.path.join(BASE_DIR, "incidents.db")
+VALID_EXT = (".jpg", ".jpeg", ".png")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL    NOT NULL,           -- unix time of the incident
+    day     TEXT    NOT NULL,           -- YYYY-MM-DD (local), same as the folder name
+    machine TEXT,
+    fire    INTEGER NOT NULL DEFAULT 0,
+    camera  TEXT,
+    path    TEXT    NOT NULL UNIQUE,    -- annotated JPEG (member name inside `archive` once compacted)
+    count   INTEGER NOT NULL DEFAULT 1, -- near-duplicate incidents merged into this one
+    ts_end  REAL,                       -- last merged incident (NULL: single incident)
+    dhash   INTEGER,                    -- 64-bit perceptual hash of the frame (signed)
+    archive TEXT                        -- accidents/YYYY-MM-DD.zip once the day is compacted
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_ts ON incidents(ts);
+CREATE INDEX IF NOT EXISTS idx_incidents_day ON incidents(day, ts);
+CREATE INDEX IF NOT EXISTS idx_incidents_machine ON incidents(machine, ts);
+"""
+
+# Columns added after the first release: (name, definition), added in place on open
+MIGRATIONS = [
+    ("count", "INTEGER NOT NULL DEFAULT 1"),
+    ("ts_end", "REAL"),
+    ("dhash", "INTEGER"),
+    ("archive", "TEXT"),
+]
+
+class IncidentStore:
+    """Indexed SQLite (WAL) store of saved incidents.
+
+    Replaces directory scans: the dashboard queries by day, time range,
+    machine or type instead of listing folders and opening JSON files.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(incidents)")}
+            for name, definition in MIGRATIONS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE incidents ADD COLUMN {name} {definition}")
+
+    def _conn(self):
+        # One connection per thread (sqlite3 connections are not thread-safe)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- WRITE ---
+    def add(self, path, machine, fire=False, camera=None, ts=None, count=1, dhash=None):
+        ts = time.time() if ts is None else ts
+        day = time.strftime("%Y-%m-%d", time.localtime(ts))
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO incidents (ts, day, machine, fire, camera, path, count, ts_end, dhash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (ts, day, machine, int(bool(fire)), camera, path, count, ts if count > 1 else None, dhash),
+            )
+
+    def merge(self, path, ts, count=1):
+        # Fold `count` more occurrences at time `ts` into the incident saved at `path`
+        # -> {"count", "ts_end"} after the update, None if there is no such incident
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE incidents SET count = count + ?, ts_end = MAX(COALESCE(ts_end, ts), ?) WHERE path = ?",
+                (count, ts, path),
+            )
+            if not cur.rowcount:
+                return None
+            row = conn.execute("SELECT count, ts_end FROM incidents WHERE path = ?", (path,)).fetchone()
+            return {"count": row["count"], "ts_end": row["ts_end"]}
+
+    def set_archive(self, day, archive):
+        with self._conn() as conn:
+            conn.execute("UPDATE incidents SET archive = ? WHERE day = ?", (archive, day))
+
+    def delete_day(self, day):
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM incidents WHERE day = ?", (day,)).rowcount
+
+    # --- READ ---
+    def dates(self):
+        rows = self._conn().execute("SELECT DISTINCT day FROM incidents ORDER BY day DESC").fetchall()
+        return [row["day"] for row in rows]
+
+    @staticmethod
+    def _where(start=None, end=None, day=None, machine=None, fire=None, camera=None):
+        # start/end: unix timestamps (inclusive / exclusive); fire: True / False / None (any)
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?"); params.append(start)
+        if end is not None:
+            clauses.append("ts < ?"); params.append(end)
+        if day is not None:
+            clauses.append("day = ?"); params.append(day)
+        if machine is not None:
+            clauses.append("machine = ?"); params.append(machine)
+        if fire is not None:
+            clauses.append("fire = ?"); params.append(int(bool(fire)))
+        if camera is not None:
+            clauses.append("camera = ?"); params.append(camera)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, limit=None, offset=0, newest_first=True, **filters):
+        where, params = self._where(**filters)
+        sql = "SELECT * FROM incidents" + where + " ORDER BY ts " + ("DESC" if newest_first else "ASC")
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return [dict(row) for row in self._conn().execute(sql, params).fetchall()]
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        return self._conn().execute("SELECT COUNT(*) FROM incidents" + where, params).fetchone()[0]
+
+    def machines(self):
+        rows = self._conn().execute("SELECT DISTINCT machine FROM incidents ORDER BY machine").fetchall()
+        return [row["machine"] for row in rows if row["machine"]]
+
+    def is_empty(self):
+        return self._conn().execute("SELECT 1 FROM incidents LIMIT 1").fetchone() is None
+
+    # --- IMPORT ---
+    def import_legacy(self, base_dir=BASE_DIR):
+        """One-shot import of the accidents/YYYY-MM-DD/HH-MM-SS[_cam].jpg|json layout
+        and of compacted days (accidents/YYYY-MM-DD.zip, through their index.json)."""
+        if not os.path.isdir(base_dir):
+            return 0
+        rows = []
+        for day in sorted(os.listdir(base_dir)):
+            folder = os.path.join(base_dir, day)
+            if day.endswith(".zip"):
+                rows.extend(self._archive_rows(folder))
+                continue
+            if not os.path.isdir(folder):
+                continue
+            try:
+                datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                continue
+
+            for name in os.listdir(folder):
+                if not name.lower().endswith(VALID_EXT):
+                    continue
+                stem = name.rsplit('.', 1)[0]
+                try:
+                    ts = datetime.strptime(f"{day} {stem.split('_')[0]}", "%Y-%m-%d %H-%M-%S").timestamp()
+                except ValueError:
+                    continue
+
+                summary = {}
+                json_path = os.path.join(folder, stem + ".json")
+                if os.path.exists(json_path):
+                    try:
+                        with open(json_path, 'r') as f:
+                            summary = json.load(f)
+                    except Exception:
+                        pass
+                rows.append((ts, day, summary.get("machine", "Unknown"), int(bool(summary.get("fire_involved", False))),
+                             summary.get("camera"), os.path.join(folder, name),
+                             summary.get("count", 1 + summary.get("merged", 0)), summary.get("ts_end"), None, None))
+
+        with self._conn() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO incidents (ts, day, machine, fire, camera, path, count, ts_end, dhash, archive) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return conn.total_changes - before
+
+    @staticmethod
+    def _archive_rows(archive):
+        # Rows from the index.json the compactor writes into each day archive
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                index = json.loads(zf.read("index.json"))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return []
+        return [(i["ts"], i["day"], i["machine"], int(bool(i["fire"])), i["camera"], i["path"],
+                 i.get("count", 1), i.get("ts_end"), i.get("dhash"), archive) for i in index]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    # Process-wide store; a brand new database is seeded from the folder layout.
+    # initialize() opens it at start-up, before any incident is written.
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IncidentStore()
+            if _store.is_empty():
+                imported = _store.import_legacy()
+                if imported:
+                    print(f"Imported {imported} incidents into {_store.db_path}")
+        return _store
+
+
+if __name__ == "__main__":
+    # python -m services.incident_store  -> (re)import the existing accidents/ folders
+    store = IncidentStore()
+    print(f"Imported {store.import_legacy()} incidents into {store.db_path}")
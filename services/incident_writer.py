@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from collections import deque
+import cv2 as cv
+import numpy as np
+from services.save_accident_frame import save_accident_frame, update_incident_json
+from services.incident_store import get_store
+
+def dhash(frame, size=8):
+    # Difference hash: 64 bits of "brighter than the pixel to the right" on a 9x8 thumbnail
+    small = cv.resize(frame, (size + 1, size), interpolation=cv.INTER_AREA)
+    if small.ndim == 3:
+        small = cv.cvtColor(small, cv.COLOR_BGR2GRAY)
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big", signed=True)   # signed: fits an SQLite INTEGER
+
+def crop(frame, region):
+    # region: [x1, y1, x2, y2] in frame pixels, clipped; None or degenerate -> the whole frame
+    if region is None:
+        return frame
+    h, w = frame.shape[:2]
+    x1, y1 = max(0, int(region[0])), max(0, int(region[1]))
+    x2, y2 = min(w, int(region[2])), min(h, int(region[3]))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return frame
+    return frame[y1:y2, x1:x2]
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+SAVE_WAIT = 10.0   # seconds a near-duplicate waits for the incident it merges into to be saved
+
+class RecentIncident:
+    """Last saved (or being saved) incident per camera / machine / fire flag."""
+
+    __slots__ = ("hash", "ts", "path", "saved")
+
+    def __init__(self, frame_hash, ts):
+        self.hash = frame_hash
+        self.ts = ts
+        self.path = None                 # set once saved (None if the save failed)
+        self.saved = threading.Event()
+
+
+class IncidentJob:
+    __slots__ = ("frame", "machine", "fire", "camera", "ts", "region", "clip", "merged")
+
+    def __init__(self, frame, machine, fire, camera, ts, region=None, clip=None):
+        self.frame = frame
+        self.machine = machine
+        self.fire = fire
+        self.camera = camera
+        self.ts = ts
+        self.region = region   # where the incident is (people / fire / zone), for the dHash
+        self.clip = clip       # callable(path_base) starting the incident's clip, if any
+        self.merged = 0   # later incidents folded into this one while queued
+
+
+class IncidentWriter:
+    """Fixed pool of writer threads draining a bounded incident queue.
+
+    submit() makes the only copy of the frame and never blocks. When the
+    queue is full:
+      1. merge - a queued incident for the same camera and machine absorbs
+         the new one (its "merged" count goes up, the first frame is kept);
+      2. drop  - otherwise the oldest queued non-fire incident is dropped
+         (the oldest fire incident only if every queued one is fire) to
+         make room. Both are counted in stats().
+
+    Near-duplicates are not written again: the saved incident's count and
+    time span grow instead ("deduplicated" in stats()). A near-duplicate has
+    the same camera / machine / fire flag, a dHash of the incident region
+    (the people or fire involved, else the zone; not the whole, mostly
+    static scene) within dedup_distance bits of the saved one, and comes
+    less than dedup_window seconds after the saved incident. The window does
+    not slide with merges, so one incident never spans more than
+    dedup_window. dedup_distance=None disables it. A job's clip callback only
+    runs for an incident that is saved, so merged ones leave no orphan clip.
+    """
+
+    def __init__(self, workers=2, max_queue=8, dedup_distance=10, dedup_window=300):
+        self.max_queue = max_queue
+        self.dedup_distance = dedup_distance
+        self.dedup_window = dedup_window
+        self.written = 0
+        self.merged = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_latency_ms = 0.0
+        self.avg_latency_ms = 0.0
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._recent = {}   # (camera, machine, fire) -> RecentIncident
+        self._merge_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"incident-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, frame, machine, fire=False, camera=None, ts=None, region=None, clip=None):
+        ts = time.time() if ts is None else ts
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                for job in self._pending:
+                    if job.camera == camera and job.machine == machine and job.fire == fire:
+                        job.merged += 1
+                        self.merged += 1
+                        return "merged"
+
+                victim = next((job for job in self._pending if not job.fire), self._pending[0])
+                self._pending.remove(victim)
+                self.dropped += 1
+
+            # Single copy per incident; the writer stamps it in place
+            self._pending.append(IncidentJob(frame.copy(), machine, fire, camera, ts, region, clip))
+            self._cond.notify()
+        return "queued"
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+
+            started = time.perf_counter()
+            key = (job.camera, job.machine, job.fire)
+            duplicate = entry = path = None
+            try:
+                frame_hash = dhash(crop(job.frame, job.region))
+                with self._cond:
+                    # Check and reserve in one step: a near-duplicate picked up by another
+                    # worker while this one is saving merges into it instead of saving too.
+                    # Compared with the saved incident (its hash and start time), not the last merge.
+                    recent = self._recent.get(key)
+                    if (recent and self.dedup_distance is not None and job.ts - recent.ts <= self.dedup_window
+                            and hamming(frame_hash, recent.hash) <= self.dedup_distance):
+                        duplicate = recent
+                    else:
+                        entry = self._recent[key] = RecentIncident(frame_hash, job.ts)
+                if duplicate:
+                    duplicate.saved.wait(SAVE_WAIT)
+                    if duplicate.path and self._merge(duplicate.path, job.ts, 1 + job.merged):
+                        path = duplicate.path
+                    else:
+                        # Its save failed: this one becomes the incident
+                        duplicate = None
+                        with self._cond:
+                            entry = self._recent[key] = RecentIncident(frame_hash, job.ts)
+                if not duplicate:
+                    path = save_accident_frame(job.frame, job.machine, job.fire, job.camera, job.ts,
+                                               in_place=True, merged=job.merged, dhash=frame_hash)
+                    if path and job.clip:
+                        # The clip shares the incident's stem (same folder as the JPEG)
+                        job.clip(os.path.splitext(path)[0])
+            except Exception as e:
+                print(f"Incident Write Error: {e}")
+                path = duplicate = None
+            finally:
+                if entry:
+                    entry.path = None if duplicate else path
+                    entry.saved.set()
+                    if entry.path is None:
+                        with self._cond:
+                            if self._recent.get(key) is entry:
+                                del self._recent[key]
+            latency_ms = (time.perf_counter() - started) * 1000
+
+            with self._cond:
+                if path is None:
+                    self.failed += 1
+                elif duplicate:
+                    self.deduplicated += 1
+                else:
+                    self.written += 1
+                self.last_latency_ms = latency_ms
+                self.avg_latency_ms += 0.2 * (latency_ms - self.avg_latency_ms)
+
+    def _merge(self, path, ts, count):
+        # Row and JSON sidecar together (import_legacy rebuilds the database from the sidecars)
+        with self._merge_lock:
+            merged = get_store().merge(path, ts, count)
+            if merged:
+                update_incident_json(path, count=merged["count"], ts_end=merged["ts_end"])
+            return merged is not None
+
+    def depth(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            "queue_depth": self.depth(),
+            "written": self.written,
+            "merged": self.merged,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_write_ms": round(self.last_latency_ms, 1),
+            "avg_write_ms": round(self.avg_latency_ms, 1),
+        }
@@ -0,0 +1,198 @@
+import cProfile
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# In-process instrumentation: stage timers with rolling percentiles, counters
+# and gauges, rendered as Prometheus text on /metrics (mjpeg_server) and as
+# the "Pipeline Metrics" panel on the dashboard.
+
+PREFIX = "zone0"
+QUANTILES = (0.5, 0.9, 0.99)
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class RollingHistogram:
+    """Last `window` observations in a ring buffer, plus lifetime count/sum."""
+
+    def __init__(self, window=1024):
+        self._values = np.zeros(window, dtype=np.float64)
+        self._next = 0
+        self._filled = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self._filled = min(self._filled + 1, len(self._values))
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self, qs=QUANTILES):
+        if not self._filled:
+            return [0.0] * len(qs)
+        return np.quantile(self._values[:self._filled], qs).tolist()
+
+
+class MetricsRegistry:
+    """Thread-safe store of stage timings, counters and gauges.
+
+    observe()/inc()/set() are a dict lookup and a few assignments under a
+    lock, cheap enough to call several times per frame.
+    """
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms = {}   # (stage, labels) -> RollingHistogram
+        self._counters = {}     # (name, labels) -> float
+        self._gauges = {}       # (name, labels) -> float
+
+    # --- RECORDING ---
+    def observe(self, stage, seconds, **labels):
+        key = (stage, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    def observe_stages(self, timings, **labels):
+        # {stage: seconds} as recorded by ZoneDetector.timings
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds, **labels)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_total(self, name, total, **labels):
+        # For totals counted elsewhere (e.g. LatestQueue.dropped)
+        with self._lock:
+            self._counters[(name, _labels(labels))] = total
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = value
+
+    # --- READING ---
+    def snapshot(self):
+        # {"stages": {label: {count, p50_ms, p90_ms, p99_ms}}, "counters": {...}, "gauges": {...}}
+        def name_of(name, labels):
+            return name + "".join(f" [{v}]" for _, v in labels)
+
+        with self._lock:
+            stages = {}
+            for (stage, labels), histogram in sorted(self._histograms.items()):
+                p50, p90, p99 = histogram.quantiles()
+                stages[name_of(stage, labels)] = {
+                    "count": histogram.count,
+                    "p50_ms": round(p50 * 1000, 2),
+                    "p90_ms": round(p90 * 1000, 2),
+                    "p99_ms": round(p99 * 1000, 2),
+                }
+            counters = {name_of(n, l): v for (n, l), v in sorted(self._counters.items())}
+            gauges = {name_of(n, l): v for (n, l), v in sorted(self._gauges.items())}
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def render(self):
+        # Prometheus text exposition format (version 0.0.4)
+        lines = []
+        with self._lock:
+            family = f"{PREFIX}_stage_seconds"
+            lines.append(f"# HELP {family} Pipeline stage latency over the last {self.window} observations.")
+            lines.append(f"# TYPE {family} summary")
+            for (stage, labels), histogram in sorted(self._histograms.items()):
+                labels = (("stage", stage),) + labels
+                for q, value in zip(QUANTILES, histogram.quantiles()):
+                    lines.append(f"{family}{_format_labels(labels, [('quantile', q)])} {value:.6f}")
+                lines.append(f"{family}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{family}_count{_format_labels(labels)} {histogram.count}")
+
+            for name in sorted({n for n, _ in self._counters}):
+                lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{PREFIX}_{name}_total{_format_labels(labels)} {value}")
+
+            for name in sorted({n for n, _ in self._gauges}):
+                lines.append(f"# TYPE {PREFIX}_{name} gauge")
+                for (n, labels), value in sorted(self._gauges.items()):
+                    if n == name:
+                        lines.append(f"{PREFIX}_{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class ProfileCapture:
+    """Periodic cProfile capture of the thread that calls tick().
+
+    cProfile only sees the thread it was enabled in, so the inference loop
+    calls tick() once per frame: every `interval` seconds it profiles for
+    `duration` seconds and writes <directory>/profile-<time>.prof (open
+    with `python -m pstats` or snakeviz). Only the newest `keep` are kept.
+    """
+
+    def __init__(self, directory="profiles", interval=600, duration=10, keep=10):
+        self.directory = directory
+        self.interval = interval
+        self.duration = duration
+        self.keep = keep
+        self._profiler = None
+        self._started = 0.0
+        self._next = time.time() + interval
+
+    @classmethod
+    def from_config(cls, config):
+        # None unless "metrics": {"profile": {"enabled": true, ...}}
+        settings = dict(config.get("profile", {}))
+        if not settings.pop("enabled", False):
+            return None
+        return cls(**settings)
+
+    def tick(self):
+        now = time.time()
+        if self._profiler is None:
+            if now >= self._next:
+                self._profiler = cProfile.Profile()
+                self._started = now
+                self._profiler.enable()
+        elif now - self._started >= self.duration:
+            self._profiler.disable()
+            self._dump(self._profiler)
+            self._profiler = None
+            self._next = now + self.interval
+
+    def _dump(self, profiler):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S.prof"))
+            profiler.dump_stats(path)
+            print(f"🔬 Profile saved: {path}")
+            for old in sorted(glob.glob(os.path.join(self.directory, "profile-*.prof")))[:-self.keep]:
+                os.remove(old)
+        except OSError as e:
+            print(f"Profile Save Error: {e}")
+
+
+registry = MetricsRegistry()
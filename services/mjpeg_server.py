@@ -0,0 +1,162 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import cv2 as cv
+from services.metrics import registry as metrics
+
+BOUNDARY = "frame"
+
+class FrameBroadcaster:
+    """Holds the latest frame and its JPEG, encoded at most once per frame.
+
+    publish() is cheap (just a reference swap); the JPEG is only produced
+    when a client asks for a frame it has not seen yet, and that single
+    encode is shared by every connected client.
+    """
+
+    def __init__(self, size=(640, 480), quality=70):
+        self.size = size
+        self.quality = quality
+        self.clients = 0
+        self.encodes = 0
+
+        self._cond = threading.Condition()
+        self._encode_lock = threading.Lock()
+        self._frame = None
+        self._seq = 0
+        self._jpeg = None
+        self._jpeg_seq = 0
+
+    def publish(self, frame):
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+
+    def connect(self, delta):
+        # Handler threads join / leave concurrently: count under the broadcaster's lock
+        with self._cond:
+            self.clients += delta
+            metrics.set("stream_clients", self.clients)
+
+    def _encode(self, frame, seq):
+        with self._encode_lock:
+            if self._jpeg_seq != seq:
+                started = time.perf_counter()
+                if self.size and frame.shape[1::-1] != tuple(self.size):
+                    frame = cv.resize(frame, tuple(self.size))
+                ok, buffer = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, self.quality])
+                if ok:
+                    self._jpeg = buffer.tobytes()
+                    self._jpeg_seq = seq
+                    self.encodes += 1
+                metrics.observe("mjpeg_encode", time.perf_counter() - started)
+            return self._jpeg_seq, self._jpeg
+
+    def next_jpeg(self, last_seq, timeout=1.0):
+        # Blocks until a frame newer than last_seq exists -> (seq, jpeg bytes) or (last_seq, None)
+        with self._cond:
+            if self._seq <= last_seq:
+                self._cond.wait_for(lambda: self._seq > last_seq, timeout)
+            if self._seq <= last_seq or self._frame is None:
+                return last_seq, None
+            frame, seq = self._frame, self._seq
+        return self._encode(frame, seq)
+
+
+class MJPEGHandler(BaseHTTPRequestHandler):
+    broadcaster = None
+    max_fps = 15
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for safety messages
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stream.mjpg":
+            fps = self.max_fps
+            try:
+                fps = min(float(parse_qs(url.query).get("fps", [fps])[0]), self.max_fps)
+            except ValueError:
+                pass
+            self._stream(max(fps, 0.1))
+        elif url.path == "/snapshot.jpg":
+            _, jpeg = self.broadcaster.next_jpeg(-1, timeout=0)
+            if jpeg is None:
+                self.send_error(503, "No frame yet")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(jpeg)))
+            self.end_headers()
+            self.wfile.write(jpeg)
+        elif url.path == "/metrics":
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def _stream(self, fps):
+        self.send_response(200)
+        self.send_header("Cache-Control", "no-cache, private")
+        self.send_header("Pragma", "no-cache")
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.end_headers()
+
+        interval = 1.0 / fps
+        last_seq, last_jpeg = 0, None
+        self.broadcaster.connect(1)
+        try:
+            while True:
+                started = time.monotonic()
+                last_seq, jpeg = self.broadcaster.next_jpeg(last_seq)
+                if jpeg is None:
+                    # No new frame: write anyway (last frame again, or preamble bytes before the
+                    # first part) so a client that went away is noticed instead of holding this thread
+                    if last_jpeg is None:
+                        self.wfile.write(b"\r\n")
+                        self.wfile.flush()
+                        continue
+                    jpeg = last_jpeg
+                last_jpeg = jpeg
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+                # Per-client frame-rate limit
+                remaining = interval - (time.monotonic() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.broadcaster.connect(-1)
+
+
+broadcaster = FrameBroadcaster()
+_server = None
+_server_lock = threading.Lock()
+
+def start_server(host="0.0.0.0", port=8502, max_fps=15, quality=70, size=(640, 480)):
+    # Idempotent: Streamlit reruns and multiple pipelines share one server
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        broadcaster.quality = quality
+        broadcaster.size = tuple(size) if size else None
+        handler = type("Handler", (MJPEGHandler,), {"broadcaster": broadcaster, "max_fps": max_fps})
+        try:
+            _server = ThreadingHTTPServer((host, port), handler)
+        except OSError as e:
+            print(f"⚠️ MJPEG server not started on {host}:{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="mjpeg-server", daemon=True).start()
+        print(f"📺 Live feed at http://{host}:{port}/stream.mjpg (metrics at /metrics)")
+        return _server
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+import cv2 as cv
+from services.metrics import registry as metrics
+
+def open_camera(source="auto", width=640, height=480):
+    # "auto" probes the first few V4L2 indices, otherwise an index or a path/URL
+    candidates = [0, 1, 2] if source == "auto" else [source]
+    for src in candidates:
+        try:
+            temp = cv.VideoCapture(src, cv.CAP_V4L2) if isinstance(src, int) else cv.VideoCapture(src)
+            if not temp.isOpened(): temp = cv.VideoCapture(src) 
+            if temp.isOpened():
+                ret, _ = temp.read()
+                if ret:
+                    temp.set(cv.CAP_PROP_FRAME_HEIGHT, height)
+                    temp.set(cv.CAP_PROP_FRAME_WIDTH, width)
+                    return temp
+                temp.release()
+        except: pass
+    return None
+
+class LatestQueue:
+    """Bounded queue where new items push out the oldest unconsumed ones.
+
+    Producers never block: when the queue is full the oldest item is dropped
+    (and counted), so consumers always see the freshest frames.
+    """
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        # Returns None on timeout or once the queue is closed and drained
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageMeter:
+    """Measures throughput (items/s) and busy time of one pipeline stage."""
+
+    def __init__(self, name, smoothing=0.1):
+        self.name = name
+        self.smoothing = smoothing
+        self.fps = 0.0
+        self.busy_ms = 0.0
+        self.count = 0
+        self._last_tick = None
+
+    def tick(self, busy_seconds=None):
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            interval = now - self._last_tick
+            if interval > 0:
+                self.fps += self.smoothing * (1.0 / interval - self.fps)
+        if busy_seconds is not None:
+            self.busy_ms += self.smoothing * (busy_seconds * 1000 - self.busy_ms)
+            metrics.observe(self.name, busy_seconds)
+        self._last_tick = now
+        self.count += 1
+
+    def snapshot(self):
+        return {"fps": round(self.fps, 1), "busy_ms": round(self.busy_ms, 1), "count": self.count}
+
+
+class CaptureThread(threading.Thread):
+    """Reads the camera as fast as it delivers and keeps only the newest frame.
+
+    Items put on the output queue are (sequence, capture_timestamp, frame).
+    """
+
+    def __init__(self, cap, output, stop_event):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.output = output
+        self.stop_event = stop_event
+        self.meter = StageMeter("capture")
+        self.seq = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            started = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                metrics.inc("capture_failures")
+                time.sleep(0.01)
+                continue
+            self.seq += 1
+            self.output.put((self.seq, time.time(), frame))
+            self.meter.tick(time.perf_counter() - started)
+        self.output.close()
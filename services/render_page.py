@@ -1,64 +1,62 @@
-from PIL import Image
+import math
 import streamlit as st
-import os
-import json
+import time
+from services.incident_store import get_store
+from services.incident_archive import read_incident_file
+from services.thumbnails import get_thumbnail
 
-VALID_EXT = (".jpg", ".jpeg", ".png")
+PAGE_SIZE = 10
 
 def render_date_page(date):
     st.title(f"Accidents on {date}")
     
-    folder = os.path.join("accidents", date)
-    
-    if not os.path.exists(folder):
-        st.error("Folder not found.")
-        return
-
-    images = sorted(
-        [f for f in os.listdir(folder) if f.lower().endswith(VALID_EXT)],
-        reverse=True
-    )
+    store = get_store()
+    total = store.count(day=date)
 
-    if not images:
+    if not total:
         st.info("No accidents recorded for this date.")
         return
 
-    for img in images:
+    # Only the current page is queried and decoded
+    pages = math.ceil(total / PAGE_SIZE)
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                               key=f"history_page_{date}")
+    st.caption(f"{total} incidents")
+
+    incidents = store.query(day=date, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE)
+
+    for incident in incidents:
         col1, col2 = st.columns([3, 1])
         
-        # 1. Get the Image Path
-        img_path = os.path.join(folder, img)
-        
-        # 2. Find the Companion JSON file
-        json_filename = img.rsplit('.', 1)[0] + ".json"
-        json_path = os.path.join(folder, json_filename)
-        
-        # Default values in case JSON is missing (legacy data)
-        machine_name = "Unknown"
-        fire = False
-        
-        # 3. Read the specific data for THIS accident
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, 'r') as f:
-                    accident_summary = json.load(f)
-                    machine_name = accident_summary.get('machine', 'Unknown')
-                    fire = accident_summary.get('fire_involved', False)
-                    
-            except Exception:
-                pass 
-        
         with col1:
             st.subheader("Frame:")
-            st.image(Image.open(img_path))
+            # Compacted days are read from the day archive (one member, random access)
+            archived = incident['archive'] is not None
+            thumb = get_thumbnail(incident['path'], (lambda i=incident: read_incident_file(i)) if archived else None)
+            if thumb is None:
+                st.warning(f"Image missing: {incident['path']}")
+            # Full resolution is only loaded when asked for
+            elif st.toggle("Full resolution", key=f"full_{incident['id']}"):
+                st.image(read_incident_file(incident) if archived else incident['path'])
+            else:
+                st.image(thumb)
 
         with col2:
             st.subheader("Accident Summary")
             
-            st.error(f"Machine: {machine_name}")
-            st.error(f"Fire Involved: {fire}")
+            st.error(f"Machine: {incident['machine'] or 'Unknown'}")
+            st.error(f"Fire Involved: {bool(incident['fire'])}")
             
-            time_str = img.rsplit('.', 1)[0].replace("-", ":")
-            st.write(f"Time: {time_str}")
+            time_str = time.strftime("%H:%M:%S", time.localtime(incident['ts']))
+            if incident['count'] > 1:
+                # Near-duplicate frames merged into this incident
+                end_str = time.strftime("%H:%M:%S", time.localtime(incident['ts_end'] or incident['ts']))
+                st.write(f"Time: {time_str} - {end_str} ({incident['count']} occurrences)")
+            else:
+                st.write(f"Time: {time_str}")
+            if incident['camera']:
+                st.write(f"Camera: {incident['camera']}")
     
-        st.divider()
\ No newline at end of file
+        st.divider()
@@ -2,38 +2,78 @@ import os
 import time
 import cv2 as cv
 import json
+from services.incident_store import get_store
+from services.thumbnails import make_thumbnail
 
 BASE_DIR = "accidents"
 
-def save_accident_frame(frame, machine_name, fire_status=False):
+def incident_paths(now, camera=None):
+    # -> (folder, file stem) shared by the JPEG, the JSON and the clip
+    folder_time = time.strftime("%Y-%m-%d", time.localtime(now))
+    file_time = time.strftime("%H-%M-%S", time.localtime(now))
+
+    # Camera suffix keeps simultaneous incidents from different cameras apart
+    file_stem = f"{file_time}_{camera}" if camera else file_time
+    return os.path.join(BASE_DIR, folder_time), file_stem
+
+def write_atomic(path, data):
+    # Temp file + rename: readers never see a half-written JPEG or JSON
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def update_incident_json(image_path, **fields):
+    # Rewrites fields of a saved incident's JSON (e.g. count / ts_end after a merge)
+    json_path = f"{os.path.splitext(image_path)[0]}.json"
+    try:
+        with open(json_path) as f:
+            log_data = json.load(f)
+    except (OSError, ValueError):
+        return False
+    log_data.update(fields)
+    write_atomic(json_path, json.dumps(log_data).encode())
+    return True
+
+def save_accident_frame(frame, machine_name, fire_status=False, camera=None, now=None,
+                        in_place=False, merged=0, dhash=None):
+    # in_place=True stamps `frame` directly (the caller already owns a copy)
     if frame is None:
         return None
 
-    folder_time = time.strftime("%Y-%m-%d", time.localtime())
-    file_time = time.strftime("%H-%M-%S", time.localtime())
+    now = time.time() if now is None else now
+    folder_time = time.strftime("%Y-%m-%d", time.localtime(now))
+    file_time = time.strftime("%H-%M-%S", time.localtime(now))
 
-    file_path = f"{file_time}.jpg"
-    folder_path = os.path.join(BASE_DIR, folder_time)
+    folder_path, file_stem = incident_paths(now, camera)
+    file_path = f"{file_stem}.jpg"
     os.makedirs(folder_path, exist_ok=True)
 
-    stamped = frame.copy()
+    stamped = frame if in_place else frame.copy()
     cv.putText(stamped, f"{folder_time} {file_time}", (50, 50), cv.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
-    success = cv.imwrite(os.path.join(folder_path, file_path), stamped)
+    success, buffer = cv.imencode('.jpg', stamped)
     if not success:
         print("Failed to save frame")
         return None
+    image_path = os.path.join(folder_path, file_path)
+    write_atomic(image_path, buffer.tobytes())
 
-    json_filename = f"{file_time}.json"
+    json_filename = f"{file_stem}.json"
     json_path = os.path.join(folder_path, json_filename)
     
     # FIX: Include fire_status in the saved JSON
     log_data = {
         "machine": machine_name,
-        "fire_involved": fire_status
+        "fire_involved": fire_status,
+        "camera": camera
     }
+    if merged:
+        # Further incidents folded into this one by the incident writer
+        log_data["merged"] = merged
     
-    with open(json_path, 'w') as f:
-        json.dump(log_data, f)
+    write_atomic(json_path, json.dumps(log_data).encode())
 
-    return os.path.join(folder_path, file_path)
\ No newline at end of file
+    make_thumbnail(image_path, stamped)
+    get_store().add(image_path, machine_name, fire_status, camera, ts=now, count=1 + merged, dhash=dhash)
+    return image_path
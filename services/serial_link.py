@@ -0,0 +1,244 @@
+import queue
+import threading
+import time
+from collections import deque
+import serial
+
+# Try internal ports used by Monitor/Serial bridge
+POSSIBLE_PORTS = ['/dev/ttyS0', '/dev/ttyACM0', '/dev/ttyUSB0', '/dev/ttyMSM0', '/dev/ttyS1']
+
+# Relay commands TOGGLE the machine in Modulino_Zone0.ino, so they must only be
+# sent once per stop; re-sending while latched would switch the machine back on.
+RELAY_COMMANDS = ("M1", "M2", "M3")
+
+# A relay command is only sent again once the board's relay state line
+# ("Relays 1 0 1", printed every loop()) still showed the machine running
+# CONFIRM_REPORTS times after the write AND confirm_timeout has passed.
+# A loop (LED matrix scroll + a command's 2 s melody) takes ~5 s, and the
+# board handles one queued command per loop, so both stay well above one loop.
+# Without state lines (older firmware) a toggle is never sent blindly again.
+CONFIRM_TIMEOUT = 15.0
+CONFIRM_REPORTS = 3
+
+class SerialLink:
+    """Owns the Modulino serial port.
+
+    - A reader thread parses temperature lines ("T:45.5" or the sketch's
+      "45.5°C") into a timestamped series, and follows the firmware's relay
+      messages to know which machines are currently latched off.
+    - A writer thread drains a command queue, so the frame loop never blocks
+      on the UART.
+    - update() is called every frame with the commands the frame wants; a
+      command is only written on a state transition, or again after
+      keepalive_interval for idempotent commands ("fire").
+    - A relay command is latched when the board answers "Motor N OFF" or
+      its relay state line shows the relay off; until then it is pending.
+      The state line is the authority: a lost reply is caught by the next
+      one, and a command is only sent again when several state lines after
+      it still show the machine running (never on a timer alone, which
+      could toggle a stopped machine back on).
+    - Opening the port resets the board: writes are held until it prints
+      its first line (or settle_time passes), without blocking the caller.
+    """
+
+    def __init__(self, ser, keepalive_interval=5.0, history_size=600, settle_time=0.0,
+                 confirm_timeout=CONFIRM_TIMEOUT):
+        self.ser = ser
+        self.keepalive_interval = keepalive_interval
+        self.confirm_timeout = confirm_timeout
+        self.settle_time = settle_time
+        self.booted = threading.Event()
+        if settle_time <= 0:
+            self.booted.set()
+
+        self.current_temp = 0.0
+        self.temperatures = deque(maxlen=history_size)  # (timestamp, celsius)
+        self.latched = {cmd: False for cmd in RELAY_COMMANDS}
+        self.commands_sent = 0
+        self.resends = 0
+        self.relay_reports = 0   # "Relays ..." state lines seen (0: firmware does not report)
+
+        self._lock = threading.Lock()
+        self._requested = {}   # source -> set of commands wanted right now
+        self._active = set()
+        self._last_sent = {}   # command -> time it was last queued
+        self._pending = {}     # relay command -> [write time, relay_reports at write, warned] until confirmed
+        self._writes = queue.Queue(maxsize=32)
+        self._stop = threading.Event()
+
+        self._reader = threading.Thread(target=self._read_loop, name="serial-reader", daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name="serial-writer", daemon=True)
+        self._reader.start()
+        self._writer.start()
+
+    @classmethod
+    def discover(cls, ports=POSSIBLE_PORTS, baud=9600, settle_time=2.0, **kwargs):
+        for port in ports:
+            try:
+                # Note: Baud rate must match Arduino "Monitor.begin(9600)"
+                ser = serial.Serial(port, baud, timeout=1)
+                print(f"✅ CONNECTED TO MODULINO: {port}")
+                # The board reboots on open; the link holds writes until it is up
+                return cls(ser, settle_time=settle_time, **kwargs)
+            except Exception:
+                continue
+        print("⚠️ MODULINO NOT FOUND (Simulation Mode)")
+        return None
+
+    # --- INPUT ---
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                raw = self.ser.readline()
+            except Exception as e:
+                print(f"Serial Read Error: {e}")
+                time.sleep(1)
+                continue
+            if raw:
+                self.booted.set()
+                self._handle_line(raw.decode('utf-8', errors='ignore').strip())
+
+    def _handle_line(self, line):
+        # Temperature: "T:45.5" (protocol) or "45.5°C" (sketch's Serial.println)
+        value = None
+        if line.startswith("T:"):
+            value = line[2:]
+        elif line.endswith("°C"):
+            value = line[:-2]
+        if value is not None:
+            try:
+                temp = float(value)
+            except ValueError:
+                return
+            self.current_temp = temp
+            self.temperatures.append((time.time(), temp))
+            return
+
+        # Relay feedback: "Relays 1 0 1" / "Motor 1 OFF" / "Motor 1 ON" / "Button 1 pressed"
+        parts = line.split()
+        with self._lock:
+            if parts and parts[0] == "Relays" and all(p in ("0", "1") for p in parts[1:]):
+                self.relay_reports += 1
+                for n, state in enumerate(parts[1:], start=1):
+                    cmd = f"M{n}"
+                    if cmd not in self.latched:
+                        continue
+                    if state == "0":
+                        self.latched[cmd] = True
+                        self._pending.pop(cmd, None)
+                    elif cmd not in self._pending:
+                        # Reset on the board (button line lost): a new stop may be sent
+                        self.latched[cmd] = False
+            elif len(parts) >= 3 and parts[0] in ("Motor", "Button") and parts[1].isdigit():
+                cmd = f"M{parts[1]}"
+                if cmd in self.latched:
+                    # Any answer settles a pending command: OFF latches, ON (the toggle
+                    # found the machine already stopped) lets the next update() send again
+                    self.latched[cmd] = (parts[0] == "Motor" and parts[2] == "OFF")
+                    self._pending.pop(cmd, None)
+            elif "MACHINES OFF" in line:
+                for cmd in self.latched:
+                    self.latched[cmd] = True
+                self._pending.clear()
+
+    def temperature_rate(self, window=10.0):
+        # °C per second over the last `window` seconds (0 if not enough samples)
+        samples = list(self.temperatures)
+        if len(samples) < 2:
+            return 0.0
+        end_t, end_temp = samples[-1]
+        for t, temp in samples:
+            if end_t - t <= window:
+                break
+        if end_t - t <= 0:
+            return 0.0
+        return (end_temp - temp) / (end_t - t)
+
+    # --- OUTPUT ---
+    def update(self, commands, source="default"):
+        """Declare the commands `source` wants asserted on this frame.
+
+        Returns the list of commands actually queued for sending.
+        """
+        now = time.time()
+        sent = []
+        with self._lock:
+            self._requested[source] = set(commands)
+            active = set().union(*self._requested.values())
+
+            for cmd in sorted(active):
+                if cmd in self.latched:
+                    # Toggle command: send once, latch on the board's reply or state line,
+                    # then wait for the button reset
+                    if self.latched[cmd]:
+                        continue
+                    pending = self._pending.get(cmd)
+                    if pending is not None:
+                        if not self._unanswered(cmd, pending, now):
+                            continue
+                        print(f"⚠️ {cmd} not acted on ({CONFIRM_REPORTS} relay reports still ON), resending")
+                        self.resends += 1
+                    if self._queue(cmd):
+                        self._pending[cmd] = [now, self.relay_reports, False]
+                        sent.append(cmd)
+                    continue
+                if cmd in self._active and now - self._last_sent.get(cmd, 0) < self.keepalive_interval:
+                    continue
+                if self._queue(cmd):
+                    self._last_sent[cmd] = now
+                    sent.append(cmd)
+
+            self._active = active
+        return sent
+
+    def _unanswered(self, cmd, pending, now):
+        # True once the board's own state lines show the command was not acted on
+        written, reports, warned = pending
+        if now - written < self.confirm_timeout:
+            return False
+        if self.relay_reports - reports >= CONFIRM_REPORTS:
+            return True
+        if not warned and not self.relay_reports:
+            print(f"⚠️ {cmd} not confirmed after {self.confirm_timeout:.0f}s; the board does not report "
+                  f"relay state, so the toggle is not sent again (check the machine)")
+            pending[2] = True
+        return False
+
+    @property
+    def pending(self):
+        # Relay commands sent but not confirmed by the board yet
+        with self._lock:
+            return sorted(self._pending)
+
+    def _queue(self, cmd):
+        try:
+            self._writes.put_nowait(cmd)
+            return True
+        except queue.Full:
+            print(f"Serial Write Queue Full, dropping {cmd}")
+            return False
+
+    def _write_loop(self):
+        if not self.booted.wait(self.settle_time):
+            self.booted.set()   # Silent board: assume it is up after settle_time
+        while not self._stop.is_set():
+            try:
+                cmd = self._writes.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                # Important: Commands must end with \n because Arduino uses readStringUntil('\n')
+                self.ser.write(cmd.encode() + b"\n")
+                self.commands_sent += 1
+                with self._lock:
+                    if cmd in self._pending:
+                        # Timeout counts from the write (held until boot), not from queueing
+                        self._pending[cmd][:2] = [time.time(), self.relay_reports]
+            except Exception as e:
+                print(f"Serial Write Error: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._writer.join(timeout=1)
+        self._reader.join(timeout=2)
+        self.ser.close()
@@ -0,0 +1,61 @@
+import threading
+import time
+from services.metrics import registry as metrics
+
+class Startup:
+    """Runs the start-up tasks (models, camera, serial port) concurrently.
+
+    Each task gets its own thread. Its state (loading / ready / unavailable
+    / failed), duration and result are kept, so the pipeline can start each
+    part as soon as what it needs is up and the dashboard can show what the
+    system is still waiting for.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def run(self, name, fn, *args, **kwargs):
+        task = {"state": "loading", "seconds": None, "error": None, "result": None,
+                "done": threading.Event()}
+        with self._lock:
+            self._tasks[name] = task
+
+        def target():
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                task["result"] = result
+                # None / all-None means "not there" (no camera, simulation mode)
+                missing = result is None or (isinstance(result, tuple) and all(r is None for r in result))
+                task["state"] = "unavailable" if missing else "ready"
+            except Exception as e:
+                task["state"] = "failed"
+                task["error"] = str(e)
+                print(f"❌ Start-up of {name} failed: {e}")
+            task["seconds"] = round(time.perf_counter() - started, 2)
+            metrics.set("startup_seconds", task["seconds"], component=name)
+            task["done"].set()
+
+        threading.Thread(target=target, name=f"startup-{name}", daemon=True).start()
+
+    def wait(self, name, timeout=None):
+        # Result of the task (None if it failed, or is still running after timeout)
+        task = self._tasks[name]
+        task["done"].wait(timeout)
+        return task["result"]
+
+    def done(self, name):
+        return self._tasks[name]["done"].is_set()
+
+    def finished(self):
+        with self._lock:
+            return all(task["done"].is_set() for task in self._tasks.values())
+
+    def snapshot(self):
+        # {name: {"state", "seconds", "error"}} for the dashboard
+        with self._lock:
+            tasks = dict(self._tasks)
+        return {name: {"state": task["state"], "seconds": task["seconds"], "error": task["error"]}
+                for name, task in tasks.items()}
@@ -1,127 +1,379 @@
+import os
 import threading 
 import time
 import cv2 as cv
-import gc
-import serial
-from services.save_accident_frame import save_accident_frame
-from accident_logic import overlap
+from services.incident_writer import IncidentWriter
+from services.clip_recorder import ClipRecorder
+from services.pipeline import LatestQueue, StageMeter, CaptureThread, open_camera
+from services.camera_workers import CameraSupervisor
+from services.mjpeg_server import broadcaster, start_server
+from services.serial_link import SerialLink, POSSIBLE_PORTS, CONFIRM_TIMEOUT
+from services.metrics import registry as metrics, ProfileCapture
+from services.startup import Startup
+from services.incident_archive import start_compactor
+from services.incident_store import get_store
+import annotate
+from accident_logic import load_models, init_default_detector, ACCIDENT_CONFIG
+import runtime_config
 
 # --- CONFIGURATION ---
 TEMP_THRESHOLD = 50.0  # Fire confirmed if Temp > 50°C
 cooldown_time = 10
 
 # --- SERIAL SETUP ---
-ser = None
-# Try internal ports used by Monitor/Serial bridge
-possible_ports = ['/dev/ttyS0', '/dev/ttyACM0', '/dev/ttyUSB0', '/dev/ttyMSM0', '/dev/ttyS1']
+# The link owns the port: background reader for temperature / relay state,
+# queued writer that only sends commands on a state change or keep-alive.
+# Opened by initialize(); None until then and in Simulation Mode.
+SERIAL_CONFIG = ACCIDENT_CONFIG.get("serial", {})
+link = None
 
-for port in possible_ports:
-    try:
-        # Note: Baud rate must match Arduino "Monitor.begin(115200)"
-        ser = serial.Serial(port, 9600, timeout=1)
-        print(f"✅ CONNECTED TO MODULINO: {port}")
-        break
-    except:
-        continue
+fake_board = None
 
-if ser is None:
-    print("⚠️ MODULINO NOT FOUND (Simulation Mode)")
+def serial_ports():
+    # ZONE0_SERIAL_PORT / "serial.port" is tried first (e.g. a fake Modulino's pty);
+    # "serial.fake" / ZONE0_FAKE_MODULINO=1 starts one in this process
+    global fake_board
+    ports = list(SERIAL_CONFIG.get("ports", POSSIBLE_PORTS))
+    port = os.environ.get("ZONE0_SERIAL_PORT", SERIAL_CONFIG.get("port"))
+    if SERIAL_CONFIG.get("fake", False) or os.environ.get("ZONE0_FAKE_MODULINO") == "1":
+        from services.fake_modulino import FakeModulino
+        fake_board = FakeModulino()
+        port = fake_board.port
+        print(f"🧪 Fake Modulino on {port}")
+    return [port] + ports if port else ports
 
-time.sleep(2)
+def connect_serial():
+    global link
+    link = SerialLink.discover(ports=serial_ports(),
+                               baud=SERIAL_CONFIG.get("baud", 9600),
+                               settle_time=SERIAL_CONFIG.get("settle_time", 2.0),
+                               keepalive_interval=SERIAL_CONFIG.get("keepalive_interval", 5.0),
+                               confirm_timeout=SERIAL_CONFIG.get("confirm_timeout", CONFIRM_TIMEOUT))
+    return link
 
-def video_live(state):
-    # --- CAMERA SETUP ---
-    cap = None
-    for i in [0, 1, 2]:
-        try:
-            temp = cv.VideoCapture(i, cv.CAP_V4L2) 
-            if not temp.isOpened(): temp = cv.VideoCapture(i) 
-            if temp.isOpened():
-                ret, _ = temp.read()
-                if ret: cap = temp; break
-                temp.release()
-        except: pass
-        
-    if not cap:
-        print("❌ CRITICAL: No camera found")
+def read_temperature(state):
+    # Latest value parsed by the serial reader thread (never blocks)
+    if link:
+        state.current_temp = link.current_temp
+        state.relays_latched = [cmd for cmd, latched in link.latched.items() if latched]
+
+def send_commands(state, machine, fire_involved_ai, source="default"):
+    commands = []
+
+    # PRIORITY 1: FIRE (AI + TEMP CHECK)
+    # We send "fire" to Arduino, and Arduino checks the temp locally
+    if fire_involved_ai:
+        commands.append("fire")
+        # We also update Python state for the UI
+        state.fire_involved = state.current_temp > TEMP_THRESHOLD # else: AI sees fire, but temp is low (False Alarm)
+
+    # PRIORITY 2: ZONE BREACH (relay from the machine's "command" in config.json)
+    elif machine:
+        command = runtime_config.current().command_for(machine)
+        if command:
+            commands.append(command)
+
+    if not link:
         return
+    with metrics.timer("serial"):
+        sent = link.update(commands, source=source)
+    for cmd in sent:
+        metrics.inc("relay_commands", command=cmd)
+        if cmd == "fire" and state.fire_involved:
+            print("Fire Detected!!")
+        elif cmd != "fire":
+            print(f"{machine} Overlap ({cmd})")
 
-    cap.set(cv.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv.CAP_PROP_FRAME_WIDTH, 640)
-    
-    last_trigger_time = 0
+def load_cameras():
+    # Camera registry from config.json; defaults to probing for one local camera
+    cameras = ACCIDENT_CONFIG.get("cameras") or [{"id": "cam0", "source": "auto"}]
+    return [dict(cam, id=str(cam.get("id", f"cam{i}"))) for i, cam in enumerate(cameras)]
+
+# --- INCIDENT CLIPS (one ring buffer per camera) ---
+CLIP_CONFIG = ACCIDENT_CONFIG.get("clips", {})
+recorders = {}
+
+# --- INCIDENT WRITER (fixed pool, bounded queue) ---
+# Started by initialize(); None in processes that never save incidents
+# (e.g. a dashboard attached to the detector service).
+WRITER_CONFIG = ACCIDENT_CONFIG.get("incident_writer", {})
+writer = None
+
+def start_writer():
+    global writer
+    if writer is None:
+        writer = IncidentWriter(workers=WRITER_CONFIG.get("workers", 2),
+                                max_queue=WRITER_CONFIG.get("max_queue", 8),
+                                dedup_distance=WRITER_CONFIG.get("dedup_distance", 10),
+                                dedup_window=WRITER_CONFIG.get("dedup_window", 300))
+    return writer
+
+def get_recorder(camera_id):
+    if not CLIP_CONFIG.get("enabled", True):
+        return None
+    if camera_id not in recorders:
+        recorders[camera_id] = ClipRecorder(pre_seconds=CLIP_CONFIG.get("pre_seconds", 3),
+                                            post_seconds=CLIP_CONFIG.get("post_seconds", 5),
+                                            fps=CLIP_CONFIG.get("fps", 5),
+                                            max_memory_mb=CLIP_CONFIG.get("max_memory_mb", 64))
+    return recorders[camera_id]
+
+# --- EXTERNAL PUBLISHERS ---
+# Objects with publish(state, camera_id, frame) called after every result,
+# e.g. the headless service's shared-memory ring / event socket.
+publishers = []
+
+def register_publisher(publisher):
+    publishers.append(publisher)
+
+# --- ANNOTATION ---
+# Detection runs on the raw frame; boxes / zones are drawn afterwards, only
+# for the consumers that show or save the frame. Disabled: nothing is drawn.
+ANNOTATE = ACCIDENT_CONFIG.get("annotation", {}).get("enabled", True)
+
+def incident_region(frame, camera_id, machine, fire, overlay=None):
+    # Box around what triggered the incident, for the writer's near-duplicate hash:
+    # the fire, else the people in the breached zone, else the zone; None = whole frame
+    boxes = []
+    zones = overlay.zones if overlay is not None else None
+    if overlay is not None:
+        if fire or machine == "CRITICAL: FIRE":
+            boxes = list(overlay.fires)
+        elif overlay.persons:
+            boxes = [person[0] for person in overlay.persons]
+            if zones is not None and machine in zones.names:
+                inside = zones.overlaps(boxes)[:, zones.names.index(machine)]
+                boxes = [box for box, hit in zip(boxes, inside.tolist()) if hit]
+    if boxes:
+        return [min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes)]
+    if zones is None:
+        zones = runtime_config.current().zones_for(camera_id, frame.shape[1], frame.shape[0])
+    if machine in zones.names:
+        return list(zones.rects[zones.names.index(machine)])
+    return None
+
+def publish_result(state, camera_id, result, last_triggers, overlay=None):
+    # overlay: the detector's findings for a raw frame (drawn here on demand);
+    # None when the frame arrives already annotated (camera workers) or raw by config
+    is_overlap, frame, machine, ppe_warning, fire_involved_ai, fall_detected = result
+    annotated = None
+
+    def annotated_frame():
+        # Drawn at most once per frame, in place (detection is done with it)
+        nonlocal annotated
+        if annotated is None:
+            annotated = frame
+            if overlay is not None and ANNOTATE:
+                with metrics.timer("drawing"):
+                    annotated = annotate.render(frame, overlay)
+        return annotated
+
+    # 1. READ TEMPERATURE FROM ARDUINO
+    read_temperature(state)
+
+    # 2. Update rest of state (aggregated over every camera)
+    cameras = getattr(state, "camera_status", None) or {}
+    cameras[camera_id] = {"machine": machine, "ppe": ppe_warning, "faint": fall_detected}
+    state.camera_status = cameras
+
+    state.machine_overlap = next((c["machine"] for c in cameras.values() if c["machine"]), None)
+    warnings = sorted({c["ppe"] for c in cameras.values() if c["ppe"]})
+    state.missing_ppe = ", ".join(warnings) if warnings else None
+    state.faint = any(c["faint"] for c in cameras.values())
+
+    # The live view follows the camera that raised the latest alert
+    if machine or not hasattr(state, "focus_camera"):
+        state.focus_camera = camera_id
+    displayed = frame is not None and state.focus_camera == camera_id
+    if displayed:
+        # Annotated only if someone is watching (stream client or attached dashboards)
+        shown = annotated_frame() if broadcaster.clients or publishers else frame
+        state.latest_frame = shown
+        # Encoded at most once, only if a dashboard is actually watching
+        broadcaster.publish(shown)
+    for publisher in publishers:
+        publisher.publish(state, camera_id, annotated_frame() if displayed else None)
+
+    recorder = get_recorder(camera_id)
+    if recorder and frame is not None and recorder.due():
+        recorder.push(annotated_frame())
+
+    # 3. SAVE INCIDENT
+    # Only save if it's a real threat (Machine breach OR Confirmed Fire)
+    real_fire = (fire_involved_ai and state.current_temp > TEMP_THRESHOLD)
     
+    if (is_overlap or real_fire) and frame is not None:
+        now = time.time()
+        if now - last_triggers.get(camera_id, 0) > cooldown_time:
+            trigger_type = "Fire" if real_fire else machine
+            if writer:
+                # The clip's frame range is fixed now (pre-roll is already buffered); the
+                # writer only starts it if the incident is saved, not merged as a near-duplicate
+                mark = recorder.mark() if recorder else None
+                clip = (lambda path_base: recorder.trigger(path_base, mark)) if mark else None
+                region = incident_region(frame, camera_id, machine, real_fire, overlay)
+                writer.submit(annotated_frame(), trigger_type, real_fire, camera_id, now, region, clip)
+            last_triggers[camera_id] = now
+            metrics.inc("incidents", camera=camera_id, fire=real_fire)
+
+def record_incident_stats():
+    # Writer outcomes as counters, queue depth as a gauge; returns writer.stats()
+    if not writer:
+        return {}
+    stats = writer.stats()
+    for outcome in ("written", "merged", "deduplicated", "dropped", "failed"):
+        metrics.set_total("incident_writes", stats[outcome], outcome=outcome)
+    metrics.set("incident_queue_depth", stats["queue_depth"])
+    return stats
+
+def publish_loop(state, camera_id, results, stop_event, meter):
+    # Stage 3: serial sensor read, UI state and incident saving
+    last_triggers = {}
+
+    while not stop_event.is_set():
+        item = results.get(timeout=0.5)
+        if item is None:
+            continue
+        started = time.perf_counter()
+        result, overlay = item
+        publish_result(state, camera_id, result, last_triggers, overlay)
+        meter.tick(time.perf_counter() - started)
+
+def run_multi_camera(state, cameras):
+    # One worker process per camera; this thread dispatches their results
+    settings = ACCIDENT_CONFIG.get("supervisor", {})
+    last_triggers = {}
+    camera_stats = {}
+
+    def on_result(camera_id, result, stats):
+        _, _, machine, _, fire_involved_ai, _ = result
+        if link:
+            supervisor.temperature_rate.value = link.temperature_rate()
+        send_commands(state, machine, fire_involved_ai, source=camera_id)
+        publish_result(state, camera_id, result, last_triggers)
+        metrics.observe_stages(stats.pop("timings", {}), camera=camera_id)
+        metrics.set_total("dropped_frames", stats.get("dropped_frames", 0), queue="capture", camera=camera_id)
+        metrics.inc("frames", camera=camera_id)
+        camera_stats[camera_id] = stats
+        state.stage_stats = {"cameras": dict(camera_stats), "workers": supervisor.status(),
+                             "incidents": record_incident_stats()}
+
+    supervisor = CameraSupervisor(cameras, on_result,
+                                  restart_delay=settings.get("restart_delay", 2),
+                                  max_restart_delay=settings.get("max_restart_delay", 60),
+                                  preview_fps=settings.get("preview_fps", 5))
+    print(f"Starting {len(cameras)} camera workers...")
+    supervisor.run(lambda: threading.main_thread().is_alive())
+
+def initialize(state, cameras):
+    # Start-up phase: serial port, models and camera come up concurrently.
+    # With several cameras the worker processes load their own models/cameras.
+    startup = Startup()
+    state.startup = startup
+    runtime_config.start_watcher()
+    # Database created / migrated (and a new one seeded from accidents/) before
+    # the first incident can be saved, so the seed never picks up a fresh file
+    get_store()
+    start_compactor(ACCIDENT_CONFIG.get("archive", {}))
+    start_writer()
+    startup.run("serial", connect_serial)
+    if len(cameras) == 1:
+        camera = cameras[0]
+        startup.run("models", load_models)
+        startup.run("camera", open_camera, camera.get("source", "auto"),
+                    camera.get("width", 640), camera.get("height", 480))
+    return startup
+
+def video_live(state):
     # Initialize temp in state if not present
     if not hasattr(state, 'current_temp'):
         state.current_temp = 0.0
 
-    while True:
-        if not threading.main_thread().is_alive(): break
-
-        # 1. READ TEMPERATURE FROM ARDUINO
-        # Expecting format: "T:45.5"
-        if ser and ser.in_waiting > 0:
-            try:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                if line.startswith("T:"):
-                    # Parse "T:45.5" -> 45.5
-                    temp_str = line.split(":")[1]
-                    state.current_temp = float(temp_str)
-            except Exception:
-                pass
-
-        cap.grab()  
-        ret, frame = cap.read()
-        if not ret: continue
-        
-        # 2. RUN AI LOGIC
-        is_overlap, annotated_frame, machine, ppe_warning, fire_involved_ai, fall_detected = overlap(frame)
-        
-        # 3. SEND COMMANDS TO ARDUINO
-        # Important: Commands must end with \n because Arduino uses readStringUntil('\n')
-        if ser:
-            try:
-                # PRIORITY 1: FIRE (AI + TEMP CHECK)
-                # We send "fire" to Arduino, and Arduino checks the temp locally
-                if fire_involved_ai:
-                     ser.write(b"fire\n")
-                     # We also update Python state for the UI
-                     if state.current_temp > TEMP_THRESHOLD:
-                         state.fire_involved = True
-                         print("Fire Detected!!")
-                     else:
-                         state.fire_involved = False # AI sees fire, but temp is low (False Alarm)
-
-                # PRIORITY 2: ZONE BREACH
-                elif machine:
-                    if "Baler" in machine:
-                        ser.write(b"M1\n") # Matches if (cmd == "M1")
-                        print("Baler Overlap")
-                    if "Hydraulic" in machine:
-                        ser.write(b"M2\n") # Matches if (cmd == "M2")
-                        print("Hydraulic Press Overlap")
-                
-            except Exception as e:
-                print(f"Serial Write Error: {e}")
-
-        # Update rest of state
-        state.machine_overlap = machine      
-        state.missing_ppe = ppe_warning      
-        state.latest_frame = annotated_frame 
-        state.faint = fall_detected
-
-        # 4. SAVE INCIDENT
-        # Only save if it's a real threat (Machine breach OR Confirmed Fire)
-        real_fire = (fire_involved_ai and state.current_temp > TEMP_THRESHOLD)
-        
-        if is_overlap or real_fire:
-            now = time.time()
-            if now - last_trigger_time > cooldown_time:
-                trigger_type = "Fire" if real_fire else machine
-                threading.Thread(target=save_accident_frame, 
-                                 args=(annotated_frame.copy(), trigger_type, real_fire)).start()
-                last_trigger_time = now
+    # --- LIVE FEED SERVER ---
+    stream = ACCIDENT_CONFIG.get("stream", {})
+    start_server(host=stream.get("host", "0.0.0.0"), port=stream.get("port", 8502),
+                 max_fps=stream.get("max_fps", 15), quality=stream.get("quality", 70),
+                 size=(stream.get("width", 640), stream.get("height", 480)))
+
+    cameras = load_cameras()
+    startup = initialize(state, cameras)
+    if len(cameras) > 1:
+        run_multi_camera(state, cameras)
+        return
+
+    # --- CAMERA SETUP ---
+    camera = cameras[0]
+    cap = startup.wait("camera")
         
-        time.sleep(0.1)
-    
-    cap.release()
\ No newline at end of file
+    if not cap:
+        print("❌ CRITICAL: No camera found")
+        return
+
+    # --- PIPELINE: capture -> inference -> publish ---
+    # Latest-frame-wins queues: a slow stage drops stale frames instead of
+    # making the camera (and everything behind it) wait.
+    stop_event = threading.Event()
+    frames = LatestQueue(maxsize=1)
+    results = LatestQueue(maxsize=2)
+
+    capture = CaptureThread(cap, frames, stop_event)
+    inference_meter = StageMeter("inference")
+    publish_meter = StageMeter("publish")
+    publisher = threading.Thread(target=publish_loop,
+                                 args=(state, camera["id"], results, stop_event, publish_meter),
+                                 name="publish", daemon=True)
+    capture.start()
+    publisher.start()
+
+    # The feed is live as soon as the camera is; raw frames until the models are in
+    while not startup.done("models") and threading.main_thread().is_alive():
+        item = frames.get(timeout=0.5)
+        if item is None:
+            continue
+        preview = item[2].copy()
+        cv.putText(preview, "STARTING: loading models...", (20, 40), cv.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        broadcaster.publish(preview)
+    detector = init_default_detector(*(startup.wait("models") or (None, None)))
+    print(f"🚀 Monitoring started {time.time() - startup.started:.1f}s after launch")
+
+    # Optional periodic cProfile dumps of this (the inference) thread
+    profiler = ProfileCapture.from_config(ACCIDENT_CONFIG.get("metrics", {}))
+
+    while threading.main_thread().is_alive():
+        item = frames.get(timeout=0.5)
+        if item is None:
+            continue
+        started = time.perf_counter()
+        _, _, frame = item
+        if profiler:
+            profiler.tick()
+
+        # 2. RUN AI LOGIC (a fast temperature rise forces the fire model on)
+        if link:
+            detector.set_temperature_trend(link.temperature_rate())
+        result = detector.overlap(frame, annotate=False)
+        _, _, machine, _, fire_involved_ai, _ = result
+
+        # 3. SEND COMMANDS TO ARDUINO (kept in this stage for interlock latency)
+        send_commands(state, machine, fire_involved_ai)
+
+        results.put((result, detector.overlay))
+        inference_meter.tick(time.perf_counter() - started)
+
+        metrics.observe_stages(detector.timings)
+        metrics.inc("frames")
+        metrics.set_total("dropped_frames", frames.dropped, queue="capture")
+        metrics.set_total("dropped_frames", results.dropped, queue="publish")
+        state.stage_stats = {
+            "capture": capture.meter.snapshot(),
+            "inference": inference_meter.snapshot(),
+            "publish": publish_meter.snapshot(),
+            "dropped_frames": frames.dropped,
+            "incidents": record_incident_stats(),
+        }
+
+    stop_event.set()
+    capture.join(timeout=1)
+    publisher.join(timeout=1)
+    cap.release()
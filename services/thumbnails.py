@@ -0,0 +1,75 @@
+import os
+import hashlib
+import threading
+import cv2 as cv
+import numpy as np
+
+BASE_DIR = "accidents"
+THUMB_DIR = os.path.join(BASE_DIR, ".thumbs")
+THUMB_SIZE = (320, 240)
+THUMB_QUALITY = 70
+MAX_CACHE_BYTES = 64 * 1024 * 1024   # LRU-evicted above this
+EVICT_EVERY = 20                     # Check the cache size every N new thumbnails
+
+_created = 0
+_lock = threading.Lock()
+
+def thumbnail_path(image_path):
+    key = hashlib.sha1(os.path.abspath(image_path).encode()).hexdigest()
+    return os.path.join(THUMB_DIR, f"{key}.jpg")
+
+def make_thumbnail(image_path, frame=None):
+    """Write the thumbnail for image_path; pass the frame at save time to skip decoding."""
+    global _created
+    if frame is None:
+        # Reduced decode: libjpeg scales down while decoding, much cheaper than full size
+        frame = cv.imread(image_path, cv.IMREAD_REDUCED_COLOR_2)
+        if frame is None:
+            return None
+
+    thumb = cv.resize(frame, THUMB_SIZE, interpolation=cv.INTER_AREA)
+    path = thumbnail_path(image_path)
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    if not cv.imwrite(path, thumb, [cv.IMWRITE_JPEG_QUALITY, THUMB_QUALITY]):
+        return None
+
+    with _lock:
+        _created += 1
+        if _created % EVICT_EVERY == 0:
+            evict()
+    return path
+
+def get_thumbnail(image_path, data=None):
+    # Cached thumbnail (generated on demand); touching it keeps it "recently used".
+    # data: callable returning the JPEG bytes, for images inside a day archive
+    path = thumbnail_path(image_path)
+    try:
+        os.utime(path)
+        return path
+    except OSError:
+        if data is None:
+            return make_thumbnail(image_path)
+        jpeg = data()
+        if jpeg is None:
+            return None
+        return make_thumbnail(image_path, cv.imdecode(np.frombuffer(jpeg, np.uint8), cv.IMREAD_REDUCED_COLOR_2))
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    # Drop least recently used thumbnails (by mtime, refreshed on access) until under budget
+    try:
+        entries = [e for e in os.scandir(THUMB_DIR) if e.is_file()]
+    except FileNotFoundError:
+        return 0
+    stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in stats)
+    removed = 0
+    for _, size, path in sorted(stats):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -86,6 +86,8 @@ void loop() {
   String temperature_text = String(temperature, 1) + "°C";
 
   Serial.println(temperature_text);
+  // Relay state every loop (1 = machine running): the Python side latches on it
+  Monitor.println(String("Relays ") + (machine1state ? "1 " : "0 ") + (machine2state ? "1 " : "0 ") + (machine3state ? "1" : "0"));
 
   // ---------- Over-temperature protection ----------
 
@@ -114,6 +116,9 @@ void loop() {
     digitalWrite(machine1, LOW);
     digitalWrite(machine2, LOW);
     digitalWrite(machine3, LOW);
+    machine1state = LOW;
+    machine2state = LOW;
+    machine3state = LOW;
 
     Monitor.println("⚠ OVER TEMPERATURE! MACHINES OFF");
     playMelody(temp_alert);
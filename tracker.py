@@ -0,0 +1,144 @@
+import numpy as np
+
+# Constant-velocity Kalman model on (cx, cy, w, h), one step per video frame
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8)
+
+def iou_matrix(a, b):
+    # a: (N, 4), b: (M, 4) as [x1, y1, x2, y2] -> (N, M) IoU, fully vectorized
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+def _to_xywh(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return np.hstack([boxes[:, :2] + wh / 2, wh])
+
+def _to_xyxy(xywh):
+    half = xywh[:, 2:4] / 2
+    return np.hstack([xywh[:, :2] - half, xywh[:, :2] + half])
+
+
+class Track:
+    """Per-person state that follows a stable track ID."""
+
+    def __init__(self, track_id):
+        self.id = track_id
+        self.hits = 1
+        self.misses = 0
+        self.fall_count = 0
+        self.violations = []     # names from the last detector pass
+        self.zone_since = {}     # machine name -> time the person entered its zone
+
+
+class PersonTracker:
+    """Lightweight SORT-style tracker.
+
+    step(boxes) is called every frame: with the detector's person boxes on
+    inference frames, with None on skipped frames (prediction only), so the
+    boxes keep moving between detector passes. Kalman predict/update and
+    IoU association run on all tracks at once.
+
+    Misses are counted in detector passes, not frames: however far the
+    scheduler backs off, a skipped frame never ages or hides a track.
+    """
+
+    def __init__(self, iou_threshold=0.1, max_age=15, max_coast=5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age          # detector passes a track survives without a detection
+        self.max_coast = max_coast      # detector passes a missed track is still reported (predicted only)
+        self.x = np.zeros((0, 8))       # [cx, cy, w, h, vcx, vcy, vw, vh]
+        self.P = np.zeros((0, 8, 8))
+        self.tracks = []
+        self._next_id = 1
+
+    def _noise(self, heights, pos_scale, vel_scale):
+        # Noise proportional to the box height (DeepSORT convention)
+        h = np.maximum(heights, 1.0)
+        std = np.stack([pos_scale * h, pos_scale * h, pos_scale * h, pos_scale * h,
+                        vel_scale * h, vel_scale * h, vel_scale * h, vel_scale * h], axis=1)
+        return np.einsum('ni,ij->nij', std ** 2, np.eye(8))
+
+    def predict(self):
+        if not self.tracks:
+            return
+        Q = self._noise(self.x[:, 3], 1 / 20, 1 / 160)
+        self.x = self.x @ _F.T
+        self.P = _F @ self.P @ _F.T + Q
+        # Boxes cannot shrink below one pixel
+        self.x[:, 2:4] = np.maximum(self.x[:, 2:4], 1.0)
+
+    def _update(self, track_idx, z):
+        # Batched Kalman update for the matched tracks
+        R = self._noise(self.x[track_idx, 3], 1 / 20, 0)[:, :4, :4]
+        P = self.P[track_idx]
+        S = _H @ P @ _H.T + R
+        K = P @ _H.T @ np.linalg.inv(S)
+        y = z - self.x[track_idx] @ _H.T
+        self.x[track_idx] += np.einsum('nij,nj->ni', K, y)
+        self.P[track_idx] = (np.eye(8) - K @ _H) @ P
+
+    def step(self, boxes=None):
+        """Advance one frame; returns [(track, [x1, y1, x2, y2]), ...]."""
+        self.predict()
+
+        if boxes is not None:
+            # A detector pass: every track missed it unless matched below
+            for track in self.tracks:
+                track.misses += 1
+            dets = _to_xywh(boxes)
+            matched_tracks, matched_dets = [], []
+
+            if self.tracks and len(dets):
+                iou = iou_matrix(self.boxes(), boxes)
+                # Greedy association on descending IoU
+                order = np.dstack(np.unravel_index(np.argsort(-iou, axis=None), iou.shape))[0]
+                used_t, used_d = set(), set()
+                for t, d in order:
+                    if iou[t, d] < self.iou_threshold:
+                        break
+                    if t in used_t or d in used_d:
+                        continue
+                    used_t.add(t); used_d.add(d)
+                    matched_tracks.append(t); matched_dets.append(d)
+
+            if matched_tracks:
+                idx = np.array(matched_tracks)
+                self._update(idx, dets[matched_dets])
+                for t in matched_tracks:
+                    self.tracks[t].hits += 1
+                    self.tracks[t].misses = 0
+
+            # New tracks for unmatched detections
+            new = [d for d in range(len(dets)) if d not in set(matched_dets)]
+            if new:
+                x_new = np.zeros((len(new), 8))
+                x_new[:, :4] = dets[new]
+                P_new = self._noise(dets[new, 3], 2 / 20, 10 / 160)
+                self.x = np.vstack([self.x, x_new])
+                self.P = np.concatenate([self.P, P_new])
+                for _ in new:
+                    self.tracks.append(Track(self._next_id))
+                    self._next_id += 1
+
+        # Drop tracks that have not been seen for too long
+        alive = np.array([t.misses <= self.max_age for t in self.tracks], dtype=bool)
+        if not alive.all():
+            self.x, self.P = self.x[alive], self.P[alive]
+            self.tracks = [t for t, keep in zip(self.tracks, alive) if keep]
+
+        return [(track, box) for track, box in zip(self.tracks, self.boxes().astype(int).tolist())
+                if track.misses <= self.max_coast]
+
+    def boxes(self):
+        return _to_xyxy(self.x[:, :4])
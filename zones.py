@@ -0,0 +1,75 @@
+import numpy as np
+import cv2 as cv
+
+def zone_polygon(machine):
+    # Normalized polygon for a machine: "polygon": [[x, y], ...] or the rectangle "zone": [x1, y1, x2, y2]
+    if machine.get('polygon'):
+        return np.asarray(machine['polygon'], dtype=np.float64)
+    x1, y1, x2, y2 = machine['zone']
+    return np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float64)
+
+def centers_inside(inner_boxes, outer_boxes):
+    # (I, 4) x (O, 4) -> (I, O) bool: centre of inner box strictly inside outer box (see is_inside)
+    inner = np.asarray(inner_boxes, dtype=np.float64).reshape(-1, 4)
+    outer = np.asarray(outer_boxes, dtype=np.float64).reshape(-1, 4)
+    cx = ((inner[:, 0] + inner[:, 2]) / 2)[:, None]
+    cy = ((inner[:, 1] + inner[:, 3]) / 2)[:, None]
+    return ((outer[None, :, 0] < cx) & (cx < outer[None, :, 2]) &
+            (outer[None, :, 1] < cy) & (cy < outer[None, :, 3]))
+
+
+class ZoneIndex:
+    """Machine zones compiled for one frame resolution.
+
+    Each zone (rectangle or polygon) is rasterized once into a mask and
+    stored as an integral image, so "does this box overlap the zone" is
+    four lookups, done for every person x zone pair in one NumPy call.
+    Build it again only when the resolution or the machine list changes.
+    """
+
+    def __init__(self, machines, width, height):
+        self.width = width
+        self.height = height
+        self.names = [m['name'] for m in machines]
+        self.polygons = []   # pixel polygons, for drawing
+        self.is_polygon = [bool(m.get('polygon')) for m in machines]
+        self.rects = []      # pixel bounding rectangles [x1, y1, x2, y2]
+        self.integrals = np.zeros((len(machines), height + 1, width + 1), dtype=np.int32)
+
+        scale = np.array([width, height], dtype=np.float64)
+        mask = np.zeros((height, width), dtype=np.uint8)
+        for i, machine in enumerate(machines):
+            poly = (zone_polygon(machine) * scale).astype(np.int32)
+            mask.fill(0)
+            if self.is_polygon[i]:
+                cv.fillPoly(mask, [poly], 1)
+            else:
+                # Rectangles cover pixels [x1, x2) x [y1, y2), matching the old overlap test
+                x1, y1 = poly[0]
+                x2, y2 = poly[2]
+                mask[max(y1, 0):max(y2, 0), max(x1, 0):max(x2, 0)] = 1
+            cv.integral(mask, self.integrals[i], sdepth=cv.CV_32S)
+            self.polygons.append(poly)
+            x, y, w, h = cv.boundingRect(poly)
+            self.rects.append([x, y, x + w, y + h])
+
+    def draw(self, frame, color=(255, 0, 0)):
+        for name, poly, is_polygon, rect in zip(self.names, self.polygons, self.is_polygon, self.rects):
+            if is_polygon:
+                cv.polylines(frame, [poly], True, color, 2)
+            else:
+                cv.rectangle(frame, tuple(poly[0]), tuple(poly[2]), color, 2)
+            cv.putText(frame, name, (rect[0], rect[1]-10), cv.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+    def overlaps(self, boxes):
+        # (P, 4) person boxes -> (P, Z) bool: box shares at least one pixel with the zone
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        if not len(boxes) or not self.names:
+            return np.zeros((len(boxes), len(self.names)), dtype=bool)
+        x1 = np.clip(boxes[:, 0], 0, self.width)
+        y1 = np.clip(boxes[:, 1], 0, self.height)
+        x2 = np.clip(boxes[:, 2], 0, self.width)
+        y2 = np.clip(boxes[:, 3], 0, self.height)
+        I = self.integrals
+        area = I[:, y2, x2] - I[:, y1, x2] - I[:, y2, x1] + I[:, y1, x1]   # (Z, P)
+        return (area > 0).T